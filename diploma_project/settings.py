@@ -33,11 +33,16 @@ INSTALLED_APPS = [
 
 SITE_ID = 1
 
+# Один бекенд: вхід за email, права як у ModelBackend і кешований get_user. Форми allauth
+# передають email у authenticate, тож окремий бекенд allauth не потрібен
 AUTHENTICATION_BACKENDS = (
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
     'main_app.auth_backends.EmailBackend',
 )
+# Скільки секунд користувач сесії живе в кеші (зміни користувача й прав скидають його одразу)
+AUTH_USER_CACHE_TIMEOUT = 300
+# Скільки секунд живуть у кеші id курсів, доступних користувачу (див. main_app.access);
+# зміни груп, курсів груп і викладачів скидають їх одразу
+COURSE_ACCESS_CACHE_TIMEOUT = 3600
 
 ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_USERNAME_REQUIRED = False
@@ -45,6 +50,9 @@ ACCOUNT_AUTHENTICATION_METHOD = 'email'
 ACCOUNT_EMAIL_VERIFICATION = 'mandatory'
 
 MIDDLEWARE = [
+    'main_app.middleware.ArrivalTimeMiddleware',
+    'main_app.middleware.InstrumentationMiddleware',
+    'main_app.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'main_app.middleware.AttendanceMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -61,7 +70,9 @@ ROOT_URLCONF = 'diploma_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, що рахує час рендерингу для Server-Timing (InstrumentationMiddleware)
+        'BACKEND': 'main_app.instrumentation.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -83,10 +94,97 @@ handler404 = 'main_app.views.custom_404'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# SQLite з прагмами з SQLITE_PRAGMAS і BEGIN IMMEDIATE, а записи з кількох воркерів вишиковуються
+# через main_app.db_writes. WAL вмикається лише для бази з SQLITE_PATH: він переписує заголовок файлу,
+# а db.sqlite3 з репозиторію лишається в режимі rollback journal.
+# DB_ENGINE=postgresql перемикає на PostgreSQL з параметрами з POSTGRES_*; POSTGRES_REPLICA_HOST
+# (або SQLITE_REPLICA_PATH для SQLite; основну базу SQLite задає SQLITE_PATH) додає alias 'replica'
+# для читань, див. main_app.db_routing
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'diploma_project'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Постійні з'єднання з перевіркою перед повторним використанням
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+    # Пул з'єднань psycopg (Django 5.1+, psycopg[pool]); з пулом CONN_MAX_AGE має бути 0
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+    if DB_POOL_MAX_SIZE:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': 10,
+        }
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+            'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        }
+else:
+    SQLITE_PATH = os.environ.get('SQLITE_PATH')
+    SQLITE_PRAGMAS = ['synchronous=NORMAL', 'cache_size=-64000', 'mmap_size=268435456', 'temp_store=MEMORY']
+    if SQLITE_PATH:
+        SQLITE_PRAGMAS.insert(0, 'journal_mode=WAL')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # busy_timeout: чекати на блокування замість негайного "database is locked"
+                'timeout': 20,
+                # Блокування запису береться на початку atomic-блоку, а не на першому UPDATE,
+                # коли його вже не можна дочекатися без відкату
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(f'PRAGMA {pragma}' for pragma in SQLITE_PRAGMAS),
+            },
+        }
+    }
+    if os.environ.get('SQLITE_REPLICA_PATH'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': os.environ['SQLITE_REPLICA_PATH'],
+        }
+
+DATABASE_ROUTERS = ['main_app.db_routing.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Сторінки (імена URL), читання яких можна віддати репліці: перегляд, аналітика, експорт і списки API
+DATABASE_REPLICA_VIEWS = {
+    'home', 'courses', 'course_detail', 'check_practicals', 'gradebook_export', 'tests', 'analytics', 'analytics_data',
+    'chart', 'user-list', 'user-detail', 'course-list', 'course-detail', 'test-list', 'test-detail',
+    'attendance_report', 'calendar', 'calendar_feed',
+}
+# Після POST читання клієнта йдуть в основну базу стільки секунд (read-your-writes)
+DATABASE_STICKY_COOKIE = 'db_primary'
+DATABASE_STICKY_SECONDS = 10
+# Репліка перевіряється не частіше ніж раз на DATABASE_REPLICA_HEALTH_INTERVAL секунд і
+# вважається недоступною, якщо відстає більше ніж на DATABASE_REPLICA_MAX_LAG секунд
+DATABASE_REPLICA_HEALTH_INTERVAL = 15
+DATABASE_REPLICA_MAX_LAG = 30
+
+# Скільки секунд запит чекає своєї черги на запис, перш ніж здатися
+DB_WRITE_QUEUE_TIMEOUT = 30
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'django',
+        'TIMEOUT': 60 * 60 * 24,
     }
 }
 
@@ -136,6 +234,86 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Медіафайли віддаються через main_app.views.serve_media з перевіркою доступу до курсу.
+# Якщо перед застосунком стоїть nginx, вкажіть тут internal location (напр. '/protected-media/'),
+# і після перевірки тіло файлу віддаватиме nginx через X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = None
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Варіанти фото профілів (квадрати зі стороною THUMBNAIL_SIZES пікселів, WebP і JPEG) генерує
+# фонове завдання в MEDIA_ROOT/THUMBNAIL_DIR. Версія фото входить в ім'я файлу, тож варіанти
+# кешуються браузером як незмінні на THUMBNAIL_CACHE_MAX_AGE
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZES = (64, 200, 320)
+THUMBNAIL_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Однакові файли (лекції, шаблони звітів) зберігаються один раз, див. main_app.storage
+STORAGES = {
+    'default': {
+        'BACKEND': 'main_app.storage.DedupFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Кеш згенерованих діаграм аналітики (PNG за sha256 від вхідних даних)
+CHART_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'charts')
+CHART_WORKERS = 2
+CHART_RENDER_TIMEOUT = 30
+# Через скільки секунд повторити запит діаграми, яку не вдалося намалювати вчасно (Retry-After у 503)
+CHART_RETRY_AFTER = 5
+
+# Порційне завантаження робіт: частини збираються тут і переносяться в MEDIA_ROOT без копіювання,
+# тому каталог має бути на тій самій файловій системі
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'uploads_tmp')
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+# Порційне завантаження, почате до дедлайну, зараховується вчасно, якщо завершилось
+# не пізніше стількох секунд після дедлайну (див. main_app.uploads.submission_arrival)
+UPLOAD_DEADLINE_GRACE = 15 * 60
+
+# Прийом робіт: файл зберігається у фоновому пулі з SUBMISSION_WORKERS потоків, а ще
+# SUBMISSION_QUEUE_SIZE робіт можуть чекати в черзі; далі запит зберігає роботу сам.
+# Квитанцію, що чекає довше за SUBMISSION_RECOVERY_AGE секунд (процес перезапустився), зберігає
+# run_workers. Проміжні файли квитанцій лежать в UPLOAD_SESSION_DIR
+SUBMISSION_WORKERS = 2
+SUBMISSION_QUEUE_SIZE = 50
+SUBMISSION_RECOVERY_AGE = 10 * 60
+
+# Фонові завдання (таблиця jobs, команда run_workers): JOB_WORKERS процесів, невдала спроба
+# повторюється через JOB_RETRY_DELAY секунд з подвоєнням, run_workers відмічає свої завдання раз
+# на JOB_HEARTBEAT_INTERVAL, і завдання без відмітки довше за JOB_TIMEOUT вважається втраченим;
+# завдання, що виконується довше за JOB_TIMEOUT, переривається з перезапуском пулу. Завершені
+# видаляються через JOB_RESULT_TTL разом з файлами результатів
+JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 1.0
+JOB_RETRY_DELAY = 30
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_TIMEOUT = 5 * 60
+JOB_RESULT_TTL = 24 * 60 * 60
+JOB_RESULTS_DIR = os.path.join(BASE_DIR, 'cache', 'jobs')
+
+# Запити, довші за SLOW_REQUEST_MS, пишуться в REQUEST_LOG_PATH (JSONL, див. команду request_stats);
+# 0 - писати всі запити. Запит, повторений у межах одного HTTP-запиту стільки разів, вважається N+1
+SLOW_REQUEST_MS = 500
+REQUEST_LOG_PATH = os.path.join(BASE_DIR, 'logs', 'slow_requests.jsonl')
+REQUEST_DUPLICATE_QUERY_THRESHOLD = 3
+
+# Сесії відвідуваності: сесія закривається після ATTENDANCE_TIMEOUT секунд без звернень,
+# а час останньої активності оновлюється в кеші не частіше ніж раз на ATTENDANCE_TOUCH_INTERVAL
+# і в базі - раз на ATTENDANCE_PERSIST_INTERVAL
+ATTENDANCE_TIMEOUT = 15 * 60
+ATTENDANCE_TOUCH_INTERVAL = 60
+ATTENDANCE_PERSIST_INTERVAL = 5 * 60
+ATTENDANCE_STATE_TTL = 24 * 60 * 60
+
+# Максимальний бал за тест; бал пропорційний частці правильних відповідей
+TEST_MAX_SCORE = 10
+
+# Скільки робіт однієї групи показувати на сторінці перевірки (None - без пагінації)
+REVIEW_SUBMISSIONS_PER_PAGE = 50
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -151,6 +329,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'main_app.pagination.IdCursorPagination',
 }
 
 SIMPLE_JWT = {
@@ -0,0 +1,147 @@
+import asyncio
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .aio import alist
+from .models import Course, User
+
+
+ACCESS_VERSION_KEY = 'course_access_version'
+
+
+def access_cache_key(user_id):
+    return f'course_access:{user_id}'
+
+
+class CourseAccess:
+    """
+    Курси користувача як відсортовані масиви цілих: viewable - курси його груп і ті, що він
+    викладає, teachable - лише ті, що викладає. Перевірка - двійковий пошук.
+    """
+
+    __slots__ = ('viewable', 'teachable')
+
+    def __init__(self, viewable, teachable):
+        self.viewable = array('q', sorted(set(viewable) | set(teachable)))
+        self.teachable = array('q', sorted(set(teachable)))
+
+    def __getstate__(self):
+        return self.viewable.tobytes(), self.teachable.tobytes()
+
+    def __setstate__(self, state):
+        self.viewable, self.teachable = array('q'), array('q')
+        self.viewable.frombytes(state[0])
+        self.teachable.frombytes(state[1])
+
+    @staticmethod
+    def contains(ids, course_id):
+        index = bisect_left(ids, course_id)
+        return index < len(ids) and ids[index] == course_id
+
+
+def course_access_querysets(user_id):
+    viewable = User.groups.through.objects.filter(user_id=user_id, group__courses__isnull=False) \
+        .values_list('group__courses', flat=True)
+    teachable = Course.teachers.through.objects.filter(user_id=user_id).values_list('course_id', flat=True)
+    return viewable, teachable
+
+
+def compute_course_access(user_id):
+    return CourseAccess(*course_access_querysets(user_id))
+
+
+async def acompute_course_access(user_id):
+    return CourseAccess(*await asyncio.gather(*map(alist, course_access_querysets(user_id))))
+
+
+def get_course_access(user):
+    """
+    Доступи користувача: спершу з самого об'єкта (один раз на запит), потім з кешу, де запис
+    звіряється із загальною версією, і лише при промаху - двома запитами до бази.
+    """
+    access = getattr(user, '_course_access', None)
+    if access is not None:
+        return access
+    key = access_cache_key(user.pk)
+    cached = cache.get_many([key, ACCESS_VERSION_KEY])
+    version = cached.get(ACCESS_VERSION_KEY, 0)
+    if key in cached and cached[key][0] == version:
+        access = cached[key][1]
+    else:
+        access = compute_course_access(user.pk)
+        cache.set(key, (version, access), settings.COURSE_ACCESS_CACHE_TIMEOUT)
+    user._course_access = access
+    return access
+
+
+async def aget_course_access(user):
+    access = getattr(user, '_course_access', None)
+    if access is not None:
+        return access
+    key = access_cache_key(user.pk)
+    cached = await cache.aget_many([key, ACCESS_VERSION_KEY])
+    version = cached.get(ACCESS_VERSION_KEY, 0)
+    if key in cached and cached[key][0] == version:
+        access = cached[key][1]
+    else:
+        access = await acompute_course_access(user.pk)
+        await cache.aset(key, (version, access), settings.COURSE_ACCESS_CACHE_TIMEOUT)
+    user._course_access = access
+    return access
+
+
+def invalidate_course_access(*user_ids):
+    cache.delete_many([access_cache_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def invalidate_all_course_access():
+    """
+    Скидає доступи всіх користувачів: зміна курсів групи чи видалення групи зачіпає всіх її
+    учасників, і простіше підняти версію, ніж шукати їх.
+    """
+    try:
+        cache.incr(ACCESS_VERSION_KEY)
+    except ValueError:
+        cache.set(ACCESS_VERSION_KEY, 1, None)
+
+
+def can_view(user, course_id):
+    """
+    Чи бачить користувач матеріали курсу: навчається в ньому через групу або викладає.
+    """
+    if course_id is None or not user.is_authenticated:
+        return False
+    return user.is_staff or CourseAccess.contains(get_course_access(user).viewable, int(course_id))
+
+
+def can_teach(user, course_id):
+    if course_id is None or not user.is_authenticated:
+        return False
+    return user.is_staff or CourseAccess.contains(get_course_access(user).teachable, int(course_id))
+
+
+def viewable_course_ids(user):
+    return list(get_course_access(user).viewable) if user.is_authenticated else []
+
+
+def teachable_course_ids(user):
+    return list(get_course_access(user).teachable) if user.is_authenticated else []
+
+
+async def acan_view(user, course_id):
+    if course_id is None or not user.is_authenticated:
+        return False
+    return user.is_staff or CourseAccess.contains((await aget_course_access(user)).viewable, int(course_id))
+
+
+async def acan_teach(user, course_id):
+    if course_id is None or not user.is_authenticated:
+        return False
+    return user.is_staff or CourseAccess.contains((await aget_course_access(user)).teachable, int(course_id))
+
+
+async def ateachable_course_ids(user):
+    return list((await aget_course_access(user)).teachable) if user.is_authenticated else []
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import GroupAdmin, UserAdmin as BaseUserAdmin
+from .forms import ScheduleForm
 from .models import Course, Module, Test, PracticalWork, Group, TestQuestion, QuestionOption, Review, Schedule, \
-    Attendance, Grade, User, LectureMaterial, PracticalWorkSubmission
+    Attendance, AttendanceDaily, Grade, User, LectureMaterial, PracticalWorkSubmission
 
 
 class GroupAdminCustom(GroupAdmin):
@@ -32,6 +33,13 @@ class ModuleInline(admin.TabularInline):
     extra = 1
 
 
+class ScheduleAdmin(admin.ModelAdmin):
+    form = ScheduleForm
+    list_display = ('course', 'start_time', 'end_time', 'location')
+    list_filter = ('course',)
+    ordering = ('-start_time',)
+
+
 class CourseAdmin(admin.ModelAdmin):
     inlines = [ModuleInline]
     list_display = ('title',)
@@ -49,8 +57,9 @@ admin.site.register(PracticalWorkSubmission)
 admin.site.register(TestQuestion)
 admin.site.register(QuestionOption)
 admin.site.register(Review)
-admin.site.register(Schedule)
+admin.site.register(Schedule, ScheduleAdmin)
 admin.site.register(Attendance)
+admin.site.register(AttendanceDaily)
 admin.site.register(Grade)
 admin.site.register(User, UserAdmin)
 
@@ -0,0 +1,5 @@
+async def alist(queryset):
+    """
+    Асинхронний list(queryset) для asyncio.gather кількох незалежних запитів.
+    """
+    return [row async for row in queryset]
@@ -0,0 +1,85 @@
+import asyncio
+from collections import defaultdict
+
+from django.db.models import Count, F
+
+from .aio import alist
+from .models import User, Course, Group, PracticalWork, CourseGradeStats, GroupGradeStats
+
+
+def statistics_querysets():
+    """
+    Запити статистики успішності. Вони незалежні між собою, тож асинхронна версія
+    виконує їх разом.
+    """
+    return {
+        'courses': Course.objects.all(),
+        'course_stats': CourseGradeStats.objects.all(),
+        'total_students': User.objects.filter(groups__courses__isnull=False)
+        .values(course_id=F('groups__courses'))
+        .annotate(total=Count('id', distinct=True)),
+        'students_passed_all': User.objects.filter(
+            groups__courses=F('practicalworksubmission__practical_work__course'),
+            practicalworksubmission__grade__isnull=False,
+        )
+        .values(course_id=F('groups__courses'))
+        .annotate(total=Count('id', distinct=True)),
+        'practicals': PracticalWork.objects.filter(course__isnull=False)
+        .values('id', 'title', 'course_id', count=F('grade_stats__count'), total=F('grade_stats__total'))
+        .order_by('id'),
+        'group_stats': GroupGradeStats.objects.all(),
+        'course_groups': Group.courses.through.objects
+        .values('course_id', 'group_id', name=F('group__name'))
+        .order_by('id'),
+    }
+
+
+def assemble_statistics(rows):
+    course_avg = {stats.course_id: stats.avg_grade for stats in rows['course_stats']}
+    total_students = {row['course_id']: row['total'] for row in rows['total_students']}
+    students_passed_all = {row['course_id']: row['total'] for row in rows['students_passed_all']}
+
+    practicals_by_course = defaultdict(list)
+    for practical in rows['practicals']:
+        practicals_by_course[practical['course_id']].append({
+            'title': practical['title'],
+            'avg_grade': practical['total'] / practical['count'] if practical['count'] else None,
+            'students_submitted': practical['count'] or 0,
+        })
+
+    group_avg = {(stats.course_id, stats.group_id): stats.avg_grade for stats in rows['group_stats']}
+    groups_by_course = defaultdict(list)
+    for row in rows['course_groups']:
+        groups_by_course[row['course_id']].append({
+            'name': row['name'],
+            'avg_grade': group_avg.get((row['course_id'], row['group_id'])),
+        })
+
+    return [
+        {
+            'course': course,
+            'avg_grade': course_avg.get(course.id),
+            'total_students': total_students.get(course.id, 0),
+            'students_passed_all': students_passed_all.get(course.id, 0),
+            'practicals': practicals_by_course[course.id],
+            'groups': groups_by_course[course.id],
+        }
+        for course in rows['courses']
+    ]
+
+
+def course_statistics():
+    """
+    Статистика успішності по всіх курсах.
+
+    Кількість запитів не залежить від кількості курсів, практичних робіт чи груп:
+    середні оцінки читаються зі зведених таблиць (див. grade_stats), решта показників
+    рахується одним згрупованим запитом, а результат збирається в пам'яті.
+    """
+    return assemble_statistics({name: list(queryset) for name, queryset in statistics_querysets().items()})
+
+
+async def acourse_statistics():
+    querysets = statistics_querysets()
+    results = await asyncio.gather(*(alist(queryset) for queryset in querysets.values()))
+    return assemble_statistics(dict(zip(querysets, results)))
@@ -0,0 +1,236 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .db_writes import serialized_write
+from .models import Attendance, AttendanceDaily, Course
+
+
+BUCKETS = {
+    'day': F('day'),
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+}
+
+
+def session_cache_key(user_id, course_id):
+    return f'attendance:{user_id}:{course_id}'
+
+
+def open_sessions(**lookup):
+    """
+    Відкриті сесії як (attendance_id, user_id, course_id, login_time, last_seen), новіші першими.
+    """
+    return Attendance.objects.filter(logout_time__isnull=True, **lookup).order_by('-login_time') \
+        .values_list('id', 'user_id', 'course_id', 'login_time', 'last_seen')
+
+
+def open_session(user_id, course_id):
+    """
+    Відкрита сесія користувача в курсі з бази: (attendance_id, login_time, last_seen) або None.
+    """
+    row = open_sessions(user_id=user_id, course_id=course_id).first()
+    if row is None:
+        return None
+    attendance_id, _, _, login_time, last_seen = row
+    return attendance_id, login_time, last_seen or login_time
+
+
+def persist_due(login_time, last_seen, now):
+    # Запис у базу, коли від входу минув ще один ATTENDANCE_PERSIST_INTERVAL
+    period = datetime.timedelta(seconds=settings.ATTENDANCE_PERSIST_INTERVAL)
+    return (now - login_time) // period != (last_seen - login_time) // period
+
+
+def record_activity(user_id, course_id, now=None):
+    """
+    Відмічає активність користувача в курсі.
+
+    Відкрита сесія - рядок Attendance без logout_time; кеш лише зберігає його id і час
+    останньої активності, щоб не шукати рядок на кожне звернення. Звернення оновлює кеш не
+    частіше ніж раз на ATTENDANCE_TOUCH_INTERVAL, а last_seen у базі - раз на
+    ATTENDANCE_PERSIST_INTERVAL, тож після витіснення з кешу сесія знаходиться в базі.
+    """
+    now = now or timezone.now()
+    key = session_cache_key(user_id, course_id)
+    state = cache.get(key)
+    cached = state is not None
+    if not cached:
+        state = open_session(user_id, course_id)
+    if state is not None:
+        attendance_id, login_time, last_seen = state
+        idle = (now - last_seen).total_seconds()
+        if idle <= settings.ATTENDANCE_TIMEOUT:
+            if idle >= settings.ATTENDANCE_TOUCH_INTERVAL or not cached:
+                if persist_due(login_time, last_seen, now):
+                    with serialized_write():
+                        Attendance.objects.filter(pk=attendance_id, logout_time__isnull=True).update(last_seen=now)
+                cache.set(key, (attendance_id, login_time, now), settings.ATTENDANCE_STATE_TTL)
+            return
+        close_sessions([(attendance_id, user_id, course_id, login_time, last_seen)])
+
+    # Курсу з таким id немає - сторінка сама відповість 404
+    if not Course.objects.filter(pk=course_id).exists():
+        return
+    with serialized_write():
+        # Паралельний запит того ж користувача міг щойно відкрити сесію
+        state = open_session(user_id, course_id)
+        if state is None:
+            attendance = Attendance.objects.create(user_id=user_id, course_id=course_id, login_time=now, last_seen=now)
+            state = (attendance.id, now, now)
+    cache.set(key, state, settings.ATTENDANCE_STATE_TTL)
+
+
+def split_by_day(start, end, tz=None):
+    """
+    Розбиває інтервал на шматки по календарних днях у TIME_ZONE: [(день, секунди), ...].
+    """
+    tz = tz or timezone.get_current_timezone()
+    start, end = start.astimezone(tz), end.astimezone(tz)
+    parts = []
+    while start < end:
+        midnight = timezone.make_aware(
+            datetime.datetime.combine(start.date() + datetime.timedelta(days=1), datetime.time()), tz)
+        chunk_end = min(end, midnight)
+        parts.append((start.date(), int((chunk_end - start).total_seconds())))
+        start = chunk_end
+    return parts
+
+
+def session_buckets(sessions):
+    """
+    Розкладає закриті сесії по денних кошиках: {(user_id, course_id, день): [секунди, сесії]}.
+    sessions - список (user_id, course_id, login, logout). Сесія рахується в день свого
+    початку, а тривалість ділиться між днями, через які вона йде.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    tz = timezone.get_current_timezone()
+    for user_id, course_id, login_time, logout_time in sessions:
+        if user_id is None or course_id is None or login_time is None or logout_time is None:
+            continue
+        deltas[user_id, course_id, login_time.astimezone(tz).date()][1] += 1
+        for day, seconds in split_by_day(login_time, logout_time, tz):
+            deltas[user_id, course_id, day][0] += seconds
+    return deltas
+
+
+def bulk_create_daily(deltas):
+    """
+    Записує кошики, для яких ще немає рядків (нові курси чи повний перерахунок), одним bulk_create.
+    """
+    AttendanceDaily.objects.bulk_create([
+        AttendanceDaily(user_id=user_id, course_id=course_id, day=day, duration=duration, sessions=count)
+        for (user_id, course_id, day), (duration, count) in deltas.items()
+    ], batch_size=2000)
+
+
+def apply_sessions(sessions):
+    """
+    Додає закриті сесії до денних зведень.
+    """
+    deltas = session_buckets(sessions)
+    with transaction.atomic():
+        for (user_id, course_id, day), (duration, count) in deltas.items():
+            lookup = {'user_id': user_id, 'course_id': course_id, 'day': day}
+            update = {'duration': F('duration') + duration, 'sessions': F('sessions') + count}
+            if AttendanceDaily.objects.filter(**lookup).update(**update):
+                continue
+            _, created = AttendanceDaily.objects.get_or_create(
+                **lookup, defaults={'duration': duration, 'sessions': count})
+            if not created:
+                AttendanceDaily.objects.filter(**lookup).update(**update)
+
+
+@serialized_write()
+def close_sessions(sessions):
+    """
+    Закриває відкриті сесії: sessions - список (attendance_id, user_id, course_id, login, logout).
+    logout_time пишеться однією bulk_update, і лише для рядків, які ще відкриті, тож
+    повторне закриття тієї самої сесії не подвоює зведення.
+    """
+    if not sessions:
+        return
+    by_id = {session[0]: session for session in sessions}
+    with transaction.atomic():
+        still_open = set(Attendance.objects.select_for_update()
+                         .filter(id__in=by_id.keys(), logout_time__isnull=True).values_list('id', flat=True))
+        Attendance.objects.bulk_update(
+            [Attendance(id=attendance_id, logout_time=by_id[attendance_id][4]) for attendance_id in still_open],
+            ['logout_time'],
+        )
+        apply_sessions([by_id[attendance_id][1:] for attendance_id in still_open])
+    # Ключ міг уже перейти до новішої сесії того ж користувача в курсі - її стан лишається
+    keys = {session_cache_key(user_id, course_id): attendance_id for attendance_id, user_id, course_id, _, _ in sessions}
+    cache.delete_many([key for key, state in cache.get_many(keys).items() if state[0] == keys[key]])
+
+
+def _session_end(row, now, logout=False):
+    """
+    Кінець відкритої сесії: остання активність з кешу або, якщо там її немає, з бази, а при
+    виході користувача - сам вихід, якщо сесія ще не простоювала довше за таймаут.
+    Повертає (рядок для close_sessions, чи сесія ще активна).
+    """
+    attendance_id, user_id, course_id, login_time, last_seen = row
+    state = cache.get(session_cache_key(user_id, course_id))
+    if state is not None and state[0] == attendance_id:
+        last_seen = state[2]
+    last_seen = last_seen or login_time
+    active = (now - last_seen).total_seconds() <= settings.ATTENDANCE_TIMEOUT
+    return (attendance_id, user_id, course_id, login_time, now if logout and active else last_seen), active
+
+
+def close_user_sessions(user_id, now=None):
+    now = now or timezone.now()
+    close_sessions([_session_end(row, now, logout=True)[0] for row in open_sessions(user_id=user_id)])
+
+
+def close_idle_sessions(now=None):
+    """
+    Закриває сесії, які простоюють довше за ATTENDANCE_TIMEOUT. Повертає кількість закритих.
+    """
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(seconds=settings.ATTENDANCE_TIMEOUT)
+    idle = []
+    for row in open_sessions(login_time__lt=cutoff).iterator():
+        session, active = _session_end(row, now)
+        if not active:
+            idle.append(session)
+    close_sessions(idle)
+    return len(idle)
+
+
+@transaction.atomic
+def rebuild_attendance_daily(chunk_size=2000):
+    """
+    Перераховує денні зведення з усіх закритих сесій.
+    """
+    AttendanceDaily.objects.all().delete()
+    closed = Attendance.objects.filter(logout_time__isnull=False, login_time__isnull=False) \
+        .values_list('user_id', 'course_id', 'login_time', 'logout_time')
+    bulk_create_daily(session_buckets(closed.iterator(chunk_size=chunk_size)))
+
+
+def attendance_report(course_id, user_id=None, date_from=None, date_to=None, bucket='week'):
+    """
+    Відвідуваність курсу з денних зведень, згрупована за днем, тижнем або місяцем:
+    список словників user_id, period, duration (секунди), sessions.
+    """
+    rows = AttendanceDaily.objects.filter(course_id=course_id)
+    if user_id is not None:
+        rows = rows.filter(user_id=user_id)
+    if date_from is not None:
+        rows = rows.filter(day__gte=date_from)
+    if date_to is not None:
+        rows = rows.filter(day__lte=date_to)
+    return list(
+        rows.annotate(period=BUCKETS[bucket])
+        .values('user_id', 'period')
+        .annotate(duration=Sum('duration'), sessions=Sum('sessions'))
+        .order_by('user_id', 'period')
+    )
@@ -1,17 +1,72 @@
-from django.contrib.auth.backends import BaseBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
 from .models import User
 
-class EmailBackend(BaseBackend):
-    def authenticate(self, request, email=None, password=None, **kwargs):
+
+USERS_VERSION_KEY = 'auth_users_version'
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate_user(*user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def invalidate_all_users():
+    """
+    Скидає кеш усіх користувачів одразу (зміна прав групи): записи зі старою версією
+    просто перестають збігатися і перечитуються з бази.
+    """
+    try:
+        cache.incr(USERS_VERSION_KEY)
+    except ValueError:
+        cache.set(USERS_VERSION_KEY, 1, None)
+
+
+def get_cached_user(user_id):
+    """
+    Користувач для сесії з кешу: одне звернення get_many по запис і загальну версію,
+    а до бази лише після промаху. Запис живе AUTH_USER_CACHE_TIMEOUT секунд.
+
+    У кеш потрапляє лише активний користувач і без хешу пароля: замість нього зберігається
+    готовий хеш сесії (User.drop_password_hash).
+    """
+    key = user_cache_key(user_id)
+    cached = cache.get_many([key, USERS_VERSION_KEY])
+    version = cached.get(USERS_VERSION_KEY, 0)
+    if key in cached and cached[key][0] == version:
+        return cached[key][1]
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None and user.is_active:
+        user.drop_password_hash()
+        cache.set(key, (version, user), settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+class EmailBackend(ModelBackend):
+    """
+    Єдиний бекенд автентифікації: вхід за email (або username, що для User - той самий email)
+    і права з ModelBackend. get_user читає користувача з кешу замість запиту на кожен запит.
+    """
+
+    def authenticate(self, request, email=None, password=None, username=None, **kwargs):
+        email = email or username or kwargs.get(User.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
         try:
             user = User.objects.get(email=email)
-            if user.check_password(password):
-                return user
         except User.DoesNotExist:
+            # Хешуємо пароль і для неіснуючого email, щоб час відповіді не видавав, чи є такий користувач
+            User().set_password(password)
             return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        user = get_cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .db_writes import serialized_write
+from .models import Grade, QuestionOption, TestQuestion
+
+
+def answer_key_cache_key(test_id):
+    return f'answer_key:{test_id}'
+
+
+def compile_answer_key(test_id):
+    """
+    Ключ відповідей тесту - кортеж (id питання, чи кілька відповідей, усі варіанти, правильні
+    варіанти) з frozenset замість рядків моделей. Будується двома запитами на весь тест.
+    """
+    questions = list(TestQuestion.objects.filter(test_id=test_id).order_by('id')
+                     .values_list('id', 'is_multiple_choice'))
+    options = {question_id: ([], []) for question_id, _ in questions}
+    for option_id, question_id, is_correct in QuestionOption.objects.filter(question__test_id=test_id) \
+            .values_list('id', 'question_id', 'is_correct'):
+        all_options, correct = options[question_id]
+        all_options.append(option_id)
+        if is_correct:
+            correct.append(option_id)
+    return tuple(
+        (question_id, bool(is_multiple), frozenset(options[question_id][0]), frozenset(options[question_id][1]))
+        for question_id, is_multiple in questions
+    )
+
+
+def get_answer_key(test_id):
+    key = answer_key_cache_key(test_id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(test_id)
+        cache.set(key, answer_key)
+    return answer_key
+
+
+def invalidate_answer_key(*test_ids):
+    cache.delete_many([answer_key_cache_key(test_id) for test_id in test_ids if test_id is not None])
+
+
+def count_correct(answer_key, answers):
+    """
+    Кількість правильних відповідей. answers - {id питання: набір id варіантів}; варіанти
+    чужих питань відкидаються, а питання з однією відповіддю, де вибрано кілька, не зараховується.
+    """
+    correct = 0
+    for question_id, is_multiple, all_options, correct_options in answer_key:
+        selected = all_options.intersection(answers.get(question_id, ()))
+        if not is_multiple and len(selected) > 1:
+            continue
+        if selected == correct_options:
+            correct += 1
+    return correct
+
+
+def score_answers(answer_key, answers):
+    if not answer_key:
+        return 0
+    return round(count_correct(answer_key, answers) * settings.TEST_MAX_SCORE / len(answer_key))
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def answers_from_post(post, answer_key):
+    """
+    Відповіді з форми take_test: поля question_<id> з id вибраних варіантів. Поля питань,
+    яких немає в ключі відповідей тесту, і нечислові id відкидаються.
+    """
+    question_ids = {question_id for question_id, _, _, _ in answer_key}
+    answers = {}
+    for key in post:
+        if not key.startswith('question_'):
+            continue
+        question_id = parse_id(key[len('question_'):])
+        if question_id in question_ids:
+            answers[question_id] = {option_id for option_id in map(parse_id, post.getlist(key)) if option_id is not None}
+    return answers
+
+
+@serialized_write()
+@transaction.atomic
+def grade_attempts(test, attempts):
+    """
+    Оцінює відповіді кількох студентів на тест і записує бали в Grade: наявні оцінки
+    оновлюються однією bulk_update, нові додаються однією bulk_create. Ключ відповідей
+    читається один раз на весь виклик. Повертає {id студента: бал}.
+    """
+    answer_key = get_answer_key(test.id)
+    scores = {student_id: score_answers(answer_key, answers) for student_id, answers in attempts.items()}
+
+    existing = {}
+    for grade in Grade.objects.select_for_update().filter(test=test, student_id__in=scores.keys()).order_by('id'):
+        existing.setdefault(grade.student_id, grade)
+
+    to_update, to_create = [], []
+    for student_id, score in scores.items():
+        grade = existing.get(student_id)
+        if grade is None:
+            to_create.append(Grade(student_id=student_id, course_id=test.course_id, test=test, score=score))
+        elif grade.score != score:
+            grade.score = score
+            to_update.append(grade)
+    if to_update:
+        Grade.objects.bulk_update(to_update, ['score'])
+    if to_create:
+        Grade.objects.bulk_create(to_create)
+    return scores
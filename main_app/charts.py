@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import reverse
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+CHART_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Діаграми малюються у пулі потоків веб-процесу, а не через чергу jobs: запит PNG чекає на рендер
+# не довше CHART_RENDER_TIMEOUT секунд і не має залежати від того, чи запущено run_workers
+_executor = None
+_pending = {}
+_lock = threading.RLock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.CHART_WORKERS, thread_name_prefix='charts')
+        return _executor
+
+
+def chart_spec(data, title):
+    # Порядок стовпців зберігається, тому спека - це список, а не словник
+    bars = [[label, values['value'], values['label']] for label, values in data.items()]
+    return {'title': title, 'bars': bars}
+
+
+def chart_key(spec):
+    payload = json.dumps(spec, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def chart_path(key, ext='png'):
+    return os.path.join(settings.CHART_CACHE_DIR, f'{key}.{ext}')
+
+
+def _write_atomic(path, write):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        write(fh)
+    os.replace(tmp_path, path)
+
+
+def render_chart(spec, fh):
+    """
+    Малює стовпчикову діаграму через об'єктний API Agg, без глобального стану pyplot,
+    тому фігура звільняється разом з об'єктом і не накопичується між запитами.
+    """
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    has_bars = False
+    for label, value, legend_label in spec['bars']:
+        if value is not None:
+            ax.bar(label, value, label=legend_label)
+            has_bars = True
+    ax.set_title(spec['title'])
+    ax.set_ylabel('Середня оцінка')
+    if has_bars:
+        ax.legend()
+    fig.savefig(fh, format='png')
+
+
+def _render_to_disk(key, spec):
+    path = chart_path(key)
+    if not os.path.exists(path):
+        _write_atomic(path, lambda fh: render_chart(spec, fh))
+    return path
+
+
+def _forget(key):
+    with _lock:
+        _pending.pop(key, None)
+
+
+def submit_chart(key, spec):
+    if os.path.exists(chart_path(key)):
+        return None
+    executor = _get_executor()
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = executor.submit(_render_to_disk, key, spec)
+            _pending[key] = future
+            future.add_done_callback(lambda f: _forget(key))
+    return future
+
+
+def chart_url(data, title):
+    """
+    Повертає URL діаграми. Якщо PNG ще немає в кеші, рендер ставиться в пул воркерів,
+    а запит до URL дочекається його завершення.
+    """
+    spec = chart_spec(data, title)
+    key = chart_key(spec)
+    os.makedirs(settings.CHART_CACHE_DIR, exist_ok=True)
+    if not os.path.exists(chart_path(key)):
+        spec_path = chart_path(key, 'json')
+        if not os.path.exists(spec_path):
+            _write_atomic(spec_path, lambda fh: fh.write(json.dumps(spec, ensure_ascii=False).encode('utf-8')))
+        submit_chart(key, spec)
+    return reverse('chart', args=[key])
+
+
+def chart_exists(key):
+    """
+    Чи є така діаграма: готовий PNG або збережена спека, з якої її можна домалювати.
+    """
+    return bool(CHART_KEY_RE.match(key)) and (os.path.exists(chart_path(key))
+                                               or os.path.exists(chart_path(key, 'json')))
+
+
+def get_chart_path(key, timeout=None):
+    """
+    Шлях до готового PNG або None, якщо такої діаграми ніколи не запитували.
+    Спека зберігається на диску, тому діаграму можна домалювати в будь-якому процесі.
+    Якщо рендер не встиг за timeout секунд, піднімає TimeoutError, а помилку рендеру
+    передає як є.
+    """
+    if not CHART_KEY_RE.match(key):
+        return None
+    path = chart_path(key)
+    if os.path.exists(path):
+        return path
+    with _lock:
+        future = _pending.get(key)
+    if future is None:
+        spec_path = chart_path(key, 'json')
+        if not os.path.exists(spec_path):
+            return None
+        with open(spec_path, encoding='utf-8') as fh:
+            spec = json.load(fh)
+        future = submit_chart(key, spec)
+        if future is None:
+            return path
+    return future.result(timeout=timeout)
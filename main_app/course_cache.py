@@ -0,0 +1,62 @@
+import asyncio
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .aio import alist
+from .models import Course, LectureMaterial, Module, PracticalWork, Test, User
+
+
+def course_cache_key(course_id):
+    return f'course_detail:{course_id}'
+
+
+def course_querysets(course_id):
+    """
+    Незалежні запити сторінки курсу. Вони не спираються один на одного, тож
+    aget_course_fragments виконує їх разом через asyncio.gather.
+    """
+    return {
+        'modules': Module.objects.filter(course_id=course_id),
+        'teachers': User.objects.filter(course=course_id).only(
+            'id', 'first_name', 'last_name', 'degree', 'profile_photo'),
+        'materials': LectureMaterial.objects.filter(course_id=course_id),
+        'practicals': PracticalWork.objects.filter(course_id=course_id),
+        'tests': Test.objects.filter(course_id=course_id),
+    }
+
+
+def render_fragments(course, related):
+    context = {'course': course, **related}
+    return {
+        'public': render_to_string('course_detail_public.html', context),
+        'materials': render_to_string('course_detail_materials.html', context),
+        'teacher_ids': {teacher.id for teacher in related['teachers']},
+    }
+
+
+async def aget_course_fragments(course_id):
+    """
+    Спільна для всіх користувачів частина сторінки курсу: програма, викладачі та матеріали.
+    При промаху кешу курс і пов'язані списки запитуються одночасно, фіксованим набором запитів.
+    Повертає None, якщо курсу не існує.
+    """
+    key = course_cache_key(course_id)
+    fragments = await cache.aget(key)
+    if fragments is not None:
+        return fragments
+
+    querysets = course_querysets(course_id)
+    course, *lists = await asyncio.gather(
+        Course.objects.filter(pk=course_id).afirst(),
+        *(alist(queryset) for queryset in querysets.values()),
+    )
+    if course is None:
+        return None
+    fragments = render_fragments(course, dict(zip(querysets, lists)))
+    await cache.aset(key, fragments)
+    return fragments
+
+
+def invalidate_course(*course_ids):
+    cache.delete_many([course_cache_key(course_id) for course_id in course_ids if course_id is not None])
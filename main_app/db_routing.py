@@ -0,0 +1,107 @@
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+class RoutingState:
+    """
+    Куди йдуть читання в межах одного запиту: alias репліки або None (основна база).
+    Після першого запису в запиті всі подальші читання теж ідуть в основну базу.
+    """
+
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        self.wrote = False
+
+
+routing_state = contextvars.ContextVar('routing_state', default=None)
+
+# alias -> (чи здорова, time.monotonic() останньої перевірки); окремо в кожному процесі
+_health = {}
+
+
+class PrimaryReplicaRouter:
+    """
+    Записи завжди йдуть в default. Читання йдуть на репліку, лише якщо ReplicaRoutingMiddleware
+    вибрав її для запиту, у запиті ще не було записів і ми не всередині транзакції основної бази.
+    Без репліки в DATABASES роутер нічого не змінює.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state.alias is None or state.wrote:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Репліка - копія основної бази, тож зв'язки між об'єктами з різних alias коректні
+        return True
+
+
+def replication_lag(connection):
+    """
+    Відставання репліки в секундах; None, якщо СУБД цього не вміє або база не є реплікою.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT CASE WHEN pg_is_in_recovery() '
+                       'THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END')
+        lag = cursor.fetchone()[0]
+    return None if lag is None else float(lag)
+
+
+def check_database(alias):
+    """
+    Перевірка однієї бази: SELECT 1, час відповіді та відставання репліки.
+    """
+    started = time.perf_counter()
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        lag = replication_lag(connection) if alias != DEFAULT_DB_ALIAS else None
+    except DatabaseError as exc:
+        return {'alias': alias, 'ok': False, 'error': str(exc), 'lag': None,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+    ok = lag is None or lag <= settings.DATABASE_REPLICA_MAX_LAG
+    return {'alias': alias, 'ok': ok, 'error': None if ok else f'Replication lag {lag:.1f}s', 'lag': lag,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+
+def replica_healthy(alias, now=None):
+    """
+    Стан репліки з пам'яті процесу; сама перевірка виконується не частіше ніж раз на
+    DATABASE_REPLICA_HEALTH_INTERVAL секунд.
+    """
+    now = time.monotonic() if now is None else now
+    healthy, checked = _health.get(alias, (True, None))
+    if checked is None or now - checked >= settings.DATABASE_REPLICA_HEALTH_INTERVAL:
+        healthy = check_database(alias)['ok']
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    """
+    Випадкова здорова репліка з DATABASE_REPLICAS або None, якщо всі недоступні.
+    """
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_healthy(alias)]
+    return random.choice(replicas) if replicas else None
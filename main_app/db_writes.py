@@ -0,0 +1,100 @@
+import fcntl
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+
+class WriteQueueTimeout(OperationalError):
+    pass
+
+
+# Окрема черга для кожного файлу бази: основна база і репліка не чекають одна на одну
+_registry_lock = threading.Lock()
+_thread_locks = {}
+_lock_files = {}
+_state = threading.local()
+
+
+def _sqlite_path(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    return str(connection.settings_dict['NAME'])
+
+
+def _thread_lock(path):
+    with _registry_lock:
+        return _thread_locks.setdefault(path, threading.RLock())
+
+
+def _lock_fh(path):
+    # Після fork (gunicorn --preload) дескриптор батьківського процесу не використовуємо
+    pid, fh = _lock_files.get(path, (None, None))
+    if pid != os.getpid():
+        fh = open(f'{path}.write-lock', 'a+b')
+        _lock_files[path] = (os.getpid(), fh)
+    return fh
+
+
+def _depths():
+    if not hasattr(_state, 'depths'):
+        _state.depths = {}
+    return _state.depths
+
+
+class serialized_write(ContextDecorator):
+    """
+    Черга на запис у SQLite для всіх воркерів: блок виконується, лише коли попередні записи
+    інших процесів і потоків завершились. Процеси вишиковуються на flock файлу поруч з базою,
+    потоки одного процесу - на RLock, тож вкладені блоки не блокують самі себе.
+    Для інших СУБД нічого не робить.
+
+        with serialized_write():
+            bulk_grade(...)
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.path = None
+
+    def _recreate_cm(self):
+        # Декоратор створює новий екземпляр на кожен виклик, щоб потоки не ділили self.active
+        return type(self)(self.using)
+
+    def __enter__(self):
+        self.path = _sqlite_path(self.using)
+        if self.path is None:
+            return self
+        deadline = time.monotonic() + settings.DB_WRITE_QUEUE_TIMEOUT
+        thread_lock = _thread_lock(self.path)
+        if not thread_lock.acquire(timeout=settings.DB_WRITE_QUEUE_TIMEOUT):
+            raise WriteQueueTimeout('Timed out waiting for the database write queue')
+        depths = _depths()
+        depth = depths.get(self.path, 0)
+        if depth == 0:
+            fh = _lock_fh(self.path)
+            while True:
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        thread_lock.release()
+                        raise WriteQueueTimeout('Timed out waiting for the database write queue')
+                    time.sleep(0.005)
+        depths[self.path] = depth + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.path is None:
+            return False
+        depths = _depths()
+        depths[self.path] -= 1
+        if depths[self.path] == 0:
+            fcntl.flock(_lock_files[self.path][1], fcntl.LOCK_UN)
+        _thread_lock(self.path).release()
+        return False
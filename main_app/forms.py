@@ -1,5 +1,7 @@
 from django import forms
-from .models import User, PracticalWorkSubmission, Course, Module, Group, LectureMaterial, PracticalWork
+from django.utils.timezone import localtime
+from .models import User, PracticalWorkSubmission, Course, Module, Group, LectureMaterial, PracticalWork, Schedule
+from .scheduling import slot_conflicts
 
 
 class ProfileForm(forms.ModelForm):
@@ -65,3 +67,24 @@ class CourseForm(forms.ModelForm):
             self.save_m2m()
         instance.groups.set(self.cleaned_data['groups'])
         return instance
+
+
+class ScheduleForm(forms.ModelForm):
+    class Meta:
+        model = Schedule
+        fields = ['course', 'start_time', 'end_time', 'location']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        course, start, end = cleaned_data.get('course'), cleaned_data.get('start_time'), cleaned_data.get('end_time')
+        if start and end and start >= end:
+            raise forms.ValidationError('Заняття має закінчуватися пізніше, ніж починається.')
+        if course and start and end:
+            conflicts = slot_conflicts(course.id, start, end, cleaned_data.get('location'), exclude_id=self.instance.pk)
+            if conflicts:
+                raise forms.ValidationError([
+                    f'Накладка з заняттям {conflict.course} {localtime(conflict.start_time):%d.%m %H:%M}-'
+                    f'{localtime(conflict.end_time):%H:%M} ({conflict.location or "без аудиторії"})'
+                    for conflict in conflicts[:5]
+                ])
+        return cleaned_data
@@ -0,0 +1,184 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import User, PracticalWork, PracticalWorkSubmission, PracticalGradeStats, CourseGradeStats, \
+    GroupGradeStats
+
+
+STAT_FIELDS = ('count', 'total', 'total_squares', 'min_grade', 'max_grade')
+
+STATS_KEY_FIELDS = {
+    PracticalGradeStats: ('practical_work_id',),
+    CourseGradeStats: ('course_id',),
+    GroupGradeStats: ('course_id', 'group_id'),
+}
+
+GRADE_AGGREGATES = {
+    'count': Count('grade'),
+    'total': Coalesce(Sum('grade'), 0),
+    'total_squares': Coalesce(Sum(F('grade') * F('grade')), 0),
+    'min_grade': Min('grade'),
+    'max_grade': Max('grade'),
+}
+
+
+def _target(key):
+    """
+    Модель зведеної таблиці, фільтр її рядка та вибірка оцінок, з яких рядок рахується.
+    """
+    graded = PracticalWorkSubmission.objects.filter(grade__isnull=False)
+    if key[0] == 'practical':
+        return PracticalGradeStats, {'practical_work_id': key[1]}, graded.filter(practical_work_id=key[1])
+    if key[0] == 'course':
+        return CourseGradeStats, {'course_id': key[1]}, graded.filter(practical_work__course_id=key[1])
+    return GroupGradeStats, {'course_id': key[1], 'group_id': key[2]}, \
+        graded.filter(practical_work__course_id=key[1], student__groups=key[2])
+
+
+def apply_grade_changes(changes):
+    """
+    Інкрементально оновлює зведені таблиці після зміни оцінок.
+
+    changes - список трійок (submission, old_grade, new_grade). Викликати після того,
+    як зміни вже записані в practical_work_submissions.
+    """
+    changes = [change for change in changes if change[1] != change[2]]
+    if not changes:
+        return
+
+    course_by_practical = dict(
+        PracticalWork.objects.filter(id__in={submission.practical_work_id for submission, _, _ in changes})
+        .values_list('id', 'course_id')
+    )
+    groups_by_student = defaultdict(set)
+    memberships = User.groups.through.objects.filter(
+        user_id__in={submission.student_id for submission, _, _ in changes},
+        group__courses__in={course_id for course_id in course_by_practical.values() if course_id},
+    ).values_list('user_id', 'group_id', 'group__courses')
+    for user_id, group_id, course_id in memberships:
+        groups_by_student[user_id, course_id].add(group_id)
+
+    deltas = defaultdict(lambda: {'count': 0, 'total': 0, 'total_squares': 0, 'added': [], 'removed': []})
+    for submission, old_grade, new_grade in changes:
+        if submission.practical_work_id is None:
+            continue
+        old_grade = int(old_grade) if old_grade is not None else None
+        new_grade = int(new_grade) if new_grade is not None else None
+        if old_grade == new_grade:
+            continue
+        course_id = course_by_practical.get(submission.practical_work_id)
+        keys = [('practical', submission.practical_work_id)]
+        if course_id is not None:
+            keys.append(('course', course_id))
+            keys.extend(('group', course_id, group_id)
+                        for group_id in groups_by_student[submission.student_id, course_id])
+        for key in keys:
+            delta = deltas[key]
+            if old_grade is not None:
+                delta['count'] -= 1
+                delta['total'] -= old_grade
+                delta['total_squares'] -= old_grade * old_grade
+                delta['removed'].append(old_grade)
+            if new_grade is not None:
+                delta['count'] += 1
+                delta['total'] += new_grade
+                delta['total_squares'] += new_grade * new_grade
+                delta['added'].append(new_grade)
+
+    with transaction.atomic():
+        for key, delta in deltas.items():
+            model, lookup, source = _target(key)
+            rows = model.objects.filter(**lookup)
+            update = {
+                'count': F('count') + delta['count'],
+                'total': F('total') + delta['total'],
+                'total_squares': F('total_squares') + delta['total_squares'],
+            }
+            if delta['added'] and not delta['removed']:
+                lowest, highest = Value(min(delta['added'])), Value(max(delta['added']))
+                update['min_grade'] = Least(Coalesce(F('min_grade'), lowest), lowest)
+                update['max_grade'] = Greatest(Coalesce(F('max_grade'), highest), highest)
+            if not rows.update(**update):
+                # Рядка ще немає - рахуємо його з вихідних даних, які вже містять цю зміну
+                if delta['added']:
+                    model.objects.get_or_create(**lookup, defaults=source.aggregate(**GRADE_AGGREGATES))
+                continue
+            if delta['removed']:
+                # Мінімум і максимум не можна відняти, тому перераховуємо їх для цього рядка
+                rows.update(**source.aggregate(min_grade=Min('grade'), max_grade=Max('grade')))
+
+
+def compute_grade_stats(course_ids=None):
+    """
+    Рахує зведені таблиці з нуля трьома згрупованими запитами (усі або лише для course_ids).
+    Повертає {(model, ключ рядка): {поле: значення}}.
+    """
+    graded = PracticalWorkSubmission.objects.filter(grade__isnull=False)
+    if course_ids is not None:
+        graded = graded.filter(practical_work__course_id__in=course_ids)
+    expected = {}
+    for row in graded.filter(practical_work__isnull=False).values('practical_work_id').annotate(**GRADE_AGGREGATES):
+        expected[PracticalGradeStats, (row.pop('practical_work_id'),)] = row
+    for row in graded.filter(practical_work__course__isnull=False) \
+            .values(course_id=F('practical_work__course')).annotate(**GRADE_AGGREGATES):
+        expected[CourseGradeStats, (row.pop('course_id'),)] = row
+    for row in graded.filter(student__groups__courses=F('practical_work__course')) \
+            .values(course_id=F('practical_work__course'), group_id=F('student__groups')) \
+            .annotate(**GRADE_AGGREGATES):
+        expected[GroupGradeStats, (row.pop('course_id'), row.pop('group_id'))] = row
+    return expected
+
+
+def find_drift(expected=None):
+    """
+    Порівнює збережені зведені таблиці з перерахованими. Повертає список
+    (model, ключ рядка, збережене значення, очікуване значення).
+    """
+    if expected is None:
+        expected = compute_grade_stats()
+    empty = {'count': 0, 'total': 0, 'total_squares': 0, 'min_grade': None, 'max_grade': None}
+    stored = {}
+    for model, key_fields in STATS_KEY_FIELDS.items():
+        for row in model.objects.values(*key_fields, *STAT_FIELDS):
+            stored[model, tuple(row.pop(field) for field in key_fields)] = row
+
+    drift = []
+    for key in stored.keys() | expected.keys():
+        actual = stored.get(key, empty)
+        wanted = expected.get(key, empty)
+        if actual != wanted:
+            drift.append((key[0], key[1], actual, wanted))
+    return drift
+
+
+@transaction.atomic
+def rebuild_grade_stats(expected=None, course_ids=None):
+    if expected is None:
+        expected = compute_grade_stats(course_ids)
+    scopes = {
+        PracticalGradeStats: {'practical_work__course_id__in': course_ids},
+        CourseGradeStats: {'course_id__in': course_ids},
+        GroupGradeStats: {'course_id__in': course_ids},
+    }
+    for model, key_fields in STATS_KEY_FIELDS.items():
+        rows = model.objects.all()
+        if course_ids is not None:
+            rows = rows.filter(**scopes[model])
+        rows.delete()
+        model.objects.bulk_create([
+            model(**dict(zip(key_fields, key)), **values)
+            for (row_model, key), values in expected.items() if row_model is model
+        ])
+
+
+def refresh_course_stats(course_ids):
+    """
+    Перераховує зведені таблиці курсів, для яких інкрементальне оновлення неможливе:
+    видалення практичної роботи, зміна складу груп чи курсів групи.
+    """
+    course_ids = [course_id for course_id in course_ids if course_id is not None]
+    if course_ids:
+        rebuild_grade_stats(course_ids=course_ids)
@@ -0,0 +1,115 @@
+import csv
+import os
+
+from django.db.models import F
+from django.utils import timezone
+
+from .jobs import job_results_dir, task
+from .models import User, Course, PracticalWork, PracticalWorkSubmission
+
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    Псевдо-файл для csv.writer: повертає рядок замість запису, щоб його можна було віддати в потік.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _format_time(value):
+    if value is None:
+        return ''
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+
+
+def gradebook_rows(course, chunk_size=CHUNK_SIZE):
+    """
+    Журнал оцінок курсу: заголовок, далі по рядку на студента з оцінкою та часом здачі
+    кожної практичної. Студенти й роботи читаються двома курсорами, впорядкованими за
+    id студента, і зливаються на ходу, тому пам'ять не залежить від розміру журналу.
+    """
+    practicals = list(PracticalWork.objects.filter(course=course).order_by('id').values_list('id', 'title'))
+    column = {practical_id: index for index, (practical_id, _) in enumerate(practicals)}
+
+    header = ['Група', 'Студент', 'Email']
+    for _, title in practicals:
+        header += [f'{title}: оцінка', f'{title}: здано']
+    yield header
+
+    students = (
+        User.objects.filter(groups__courses=course)
+        .annotate(group_name=F('groups__name'))
+        .order_by('id', 'group_name')
+        .values_list('id', 'group_name', 'first_name', 'last_name', 'email')
+        .iterator(chunk_size=chunk_size)
+    )
+    submissions = (
+        PracticalWorkSubmission.objects.filter(practical_work__course=course, student__isnull=False)
+        .order_by('student_id')
+        .values_list('student_id', 'practical_work_id', 'grade', 'submitted_at')
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = next(submissions, None)
+
+    def build_row(student_id, groups, name, email):
+        nonlocal pending
+        cells = [''] * (2 * len(practicals))
+        # Пропускаємо роботи студентів, які не входять до жодної групи курсу
+        while pending is not None and pending[0] < student_id:
+            pending = next(submissions, None)
+        while pending is not None and pending[0] == student_id:
+            _, practical_id, grade, submitted_at = pending
+            index = column[practical_id]
+            cells[2 * index] = '' if grade is None else grade
+            cells[2 * index + 1] = _format_time(submitted_at)
+            pending = next(submissions, None)
+        return [', '.join(groups), name, email] + cells
+
+    current = None
+    for student_id, group_name, first_name, last_name, email in students:
+        if current is not None and current[0] == student_id:
+            current[1].append(group_name)
+            continue
+        if current is not None:
+            yield build_row(*current)
+        current = (student_id, [group_name], f'{first_name} {last_name}'.strip(), email)
+    if current is not None:
+        yield build_row(*current)
+
+
+def gradebook_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM, щоб Excel відкривав кирилицю без танців з кодуванням
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_gradebook_xlsx(rows, fh):
+    # openpyxl не входить у залежності проєкту, тому імпортується лише тут
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Журнал')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(fh)
+
+
+@task(priority=10, max_attempts=2)
+def export_gradebook_xlsx(job, course_id):
+    """
+    Фоновий експорт журналу в XLSX: файл лишається в каталозі результатів завдання,
+    а представлення job_download віддає його автору завдання.
+    """
+    course = Course.objects.get(pk=course_id)
+    directory = job_results_dir(job)
+    os.makedirs(directory, exist_ok=True)
+    filename = f'gradebook_{course.id}.xlsx'
+    with open(os.path.join(directory, filename), 'wb') as fh:
+        write_gradebook_xlsx(gradebook_rows(course), fh)
+    return {'file': filename}
@@ -0,0 +1,121 @@
+from math import ceil
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .db_writes import serialized_write
+from .grade_stats import apply_grade_changes
+from .models import PracticalWorkSubmission
+
+
+def parse_grade(value):
+    if value is None or str(value).strip() == '':
+        return None
+    return int(value)
+
+
+def grades_from_post(post):
+    """
+    Оцінки з форми check_practical_details: {id роботи: оцінка або None}.
+    Роботи, яких немає у формі, не зачіпаються.
+    """
+    grades = {}
+    for key, value in post.items():
+        if key.startswith('grade_'):
+            grades[int(key[len('grade_'):])] = parse_grade(value)
+    return grades
+
+
+def validate_grades(practical_work, grades):
+    """
+    ValueError, якщо якась оцінка виходить за межі 0..max_score практичної.
+    """
+    for grade in grades.values():
+        if grade is not None and not 0 <= grade <= practical_work.max_score:
+            raise ValueError(f'Grades must be between 0 and {practical_work.max_score:g}')
+
+
+@serialized_write()
+@transaction.atomic
+def bulk_grade(practical_work, grades, teacher):
+    """
+    Записує оцінки однією bulk_update у транзакції, оновлюючи лише ті роботи,
+    оцінка яких справді змінилась. Якщо якась оцінка поза межами (validate_grades),
+    не записується жодна. Повертає кількість змінених робіт.
+    """
+    validate_grades(practical_work, grades)
+    submissions = PracticalWorkSubmission.objects.select_for_update().filter(
+        practical_work=practical_work, id__in=grades.keys(),
+    ).only('id', 'practical_work_id', 'student_id', 'grade', 'grade_date', 'teacher_id')
+
+    now = timezone.now()
+    changes = []
+    for submission in submissions:
+        new_grade = grades[submission.id]
+        if new_grade == submission.grade:
+            continue
+        changes.append((submission, submission.grade, new_grade))
+        submission.grade = new_grade
+        if new_grade is None:
+            submission.grade_date = None
+            submission.teacher = None
+        else:
+            submission.grade_date = now
+            submission.teacher = teacher
+
+    if changes:
+        PracticalWorkSubmission.objects.bulk_update(
+            [submission for submission, _, _ in changes], ['grade', 'grade_date', 'teacher'],
+        )
+        # bulk_update не надсилає сигналів, тому зведені таблиці оновлюємо явно
+        apply_grade_changes(changes)
+    return len(changes)
+
+
+def submissions_by_group(course, practical_work, pages=None, per_page=None):
+    """
+    Роботи студентів з файлами, розкладені по групах курсу, одним запитом.
+
+    Якщо задано per_page, з кожної групи вибирається лише сторінка pages[group.id]
+    (за замовчуванням перша), тож кількість запитів і пам'ять не залежать від кількості робіт.
+    Повертає список словників group, submissions, page, num_pages.
+    """
+    pages = pages or {}
+    groups = list(course.groups.all())
+    submissions = (
+        PracticalWorkSubmission.objects
+        .filter(practical_work=practical_work, student__groups__courses=course)
+        .exclude(file='').exclude(file__isnull=True)
+        .select_related('student')
+        .annotate(group_id=F('student__groups'))
+    )
+
+    counts = {}
+    if per_page:
+        counts = dict(submissions.values_list('group_id').annotate(total=Count('id')).order_by())
+        wanted_page = Case(
+            *[When(group_id=group.id, then=Value(pages.get(group.id, 1))) for group in groups],
+            default=Value(1), output_field=IntegerField(),
+        )
+        submissions = submissions.annotate(
+            row_number=Window(RowNumber(), partition_by=F('student__groups'),
+                              order_by=[F('student__last_name'), F('student__first_name'), F('id')]),
+            wanted_page=wanted_page,
+        ).filter(row_number__gt=(F('wanted_page') - 1) * per_page, row_number__lte=F('wanted_page') * per_page)
+    submissions = submissions.order_by('student__last_name', 'student__first_name', 'id')
+
+    buckets = {group.id: [] for group in groups}
+    for submission in submissions:
+        buckets[submission.group_id].append(submission)
+
+    return [
+        {
+            'group': group,
+            'submissions': buckets[group.id],
+            'page': pages.get(group.id, 1) if per_page else 1,
+            'num_pages': max(1, ceil(counts.get(group.id, 0) / per_page)) if per_page else 1,
+        }
+        for group in groups
+    ]
@@ -0,0 +1,125 @@
+import contextvars
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.template.backends import django as django_backend
+from django.utils import timezone
+
+
+current_metrics = contextvars.ContextVar('current_metrics', default=None)
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'\((?:\s*(?:%s|\?|\$\d+)\s*,)+\s*(?:%s|\?|\$\d+)\s*\)')
+
+
+def fingerprint(sql):
+    """
+    Відбиток запиту без значень: однакові запити з різними id (класичний N+1) мають один відбиток.
+    """
+    normalized = IN_LIST_RE.sub('(...)', LITERAL_RE.sub('?', sql))
+    return hashlib.sha1(' '.join(normalized.split()).encode()).hexdigest()[:12], normalized
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+        self.samples = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            key, normalized = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, normalized)
+
+    def duplicates(self):
+        threshold = settings.REQUEST_DUPLICATE_QUERY_THRESHOLD
+        return [
+            {'fingerprint': key, 'count': count, 'sql': self.samples[key][:500]}
+            for key, count in self.fingerprints.most_common() if count >= threshold
+        ]
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Вкладені include та extends уже входять у час зовнішнього шаблону
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(django_backend.DjangoTemplates):
+    """
+    Бекенд шаблонів Django, що додає час рендерингу до метрик поточного запиту
+    (InstrumentationMiddleware). Без метрик шаблон рендериться як звичайно.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def log_request(request, response, metrics, total):
+    path = settings.REQUEST_LOG_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    match = getattr(request, 'resolver_match', None)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 2),
+        'db_ms': round(metrics.db_time * 1000, 2),
+        'template_ms': round(metrics.template_time * 1000, 2),
+        'queries': metrics.queries,
+        'duplicates': metrics.duplicates(),
+    }
+    # Один write на рядок у режимі дописування, тож рядки з різних процесів не перемішуються
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def percentile(values, percent):
+    """
+    Перцентиль за найближчим рангом для відсортованого списку.
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
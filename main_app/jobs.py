@@ -0,0 +1,193 @@
+import datetime
+import os
+import shutil
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .db_writes import serialized_write
+from .instrumentation import percentile
+from .models import Job
+
+
+def task(priority=0, max_attempts=3):
+    """
+    Робить функцію фоновим завданням. Аргументи й результат мають серіалізуватися в JSON,
+    а сама функція - імпортуватися за повним ім'ям, бо виконується в іншому процесі.
+
+        @task(priority=10)
+        def export_gradebook_xlsx(job, course_id):
+            ...
+
+    Першим аргументом функція отримує сам Job (для шляху результатів і спроб).
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.priority = priority
+        func.max_attempts = max_attempts
+        return func
+    return decorator
+
+
+def resolve_task(name):
+    func = import_string(name)
+    if getattr(func, 'task_name', None) != name:
+        raise ValueError(f'{name} is not a registered task')
+    return func
+
+
+def enqueue(func, *args, user=None, priority=None, run_after=None, **kwargs):
+    """
+    Ставить завдання в чергу і повертає Job; статус і результат опитуються за його id.
+    Усередині транзакції завдання стане видимим воркерам лише після коміту.
+    """
+    return Job.objects.create(
+        task=func.task_name,
+        args=list(args),
+        kwargs=kwargs,
+        user=user,
+        priority=func.priority if priority is None else priority,
+        max_attempts=func.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def job_results_dir(job):
+    return os.path.join(settings.JOB_RESULTS_DIR, str(job.pk))
+
+
+def claim_job(worker):
+    """
+    Бере наступне готове завдання: найвищий пріоритет, далі найстаріше. Перехід у running
+    умовний, тож кілька процесів run_workers не візьмуть одне завдання двічі.
+    """
+    now = timezone.now()
+    with serialized_write():
+        while True:
+            job_id = Job.objects.filter(status=Job.QUEUED, run_after__lte=now) \
+                .order_by('-priority', 'run_after', 'id').values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+                status=Job.RUNNING, started_at=now, heartbeat_at=now, worker=worker, attempts=F('attempts') + 1)
+            if claimed:
+                return job_id
+
+
+def heartbeat(worker, job_ids):
+    """
+    Відмічає, що завдання job_ids ще виконуються в run_workers worker.
+    """
+    if not job_ids:
+        return
+    with serialized_write():
+        Job.objects.filter(pk__in=list(job_ids), status=Job.RUNNING, worker=worker).update(heartbeat_at=timezone.now())
+
+
+def retry_or_fail(job_id, worker, error, stale_before=None):
+    """
+    Повертає завдання в чергу з подвоєнням затримки JOB_RETRY_DELAY після кожної спроби,
+    а після max_attempts спроб позначає як невдале. Діє, лише поки завдання виконується
+    тим самим worker (і, якщо задано stale_before, без новішої відмітки): інакше його вже
+    повернули в чергу чи взяв інший воркер. Повертає True, якщо статус змінено.
+    """
+    now = timezone.now()
+    running = Job.objects.filter(pk=job_id, status=Job.RUNNING, worker=worker)
+    if stale_before is not None:
+        running = running.filter(heartbeat_at__lt=stale_before)
+    with serialized_write():
+        job = running.only('attempts', 'max_attempts').first()
+        if job is None:
+            return False
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** max(job.attempts - 1, 0)
+            changed = running.update(status=Job.QUEUED, error=error, run_after=now + datetime.timedelta(seconds=delay))
+        else:
+            changed = running.update(status=Job.FAILED, error=error, finished_at=now)
+    return bool(changed)
+
+
+def release_job(job_id, worker):
+    """
+    Повертає завдання в чергу одразу і без витраченої спроби: його перервали не через нього
+    самого, а разом з пулом run_workers. Повертає True, якщо статус змінено.
+    """
+    with serialized_write():
+        return bool(Job.objects.filter(pk=job_id, status=Job.RUNNING, worker=worker)
+                    .update(status=Job.QUEUED, attempts=F('attempts') - 1))
+
+
+def run_job(job_id):
+    """
+    Виконує завдання у процесі воркера і записує результат або помилку.
+    """
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            result = resolve_task(job.task)(job, *job.args, **job.kwargs)
+        except Exception:
+            retry_or_fail(job_id, job.worker, traceback.format_exc())
+            return Job.FAILED
+        with serialized_write():
+            Job.objects.filter(pk=job_id, status=Job.RUNNING, worker=job.worker).update(
+                status=Job.SUCCEEDED, result=result, error='', finished_at=timezone.now())
+        return Job.SUCCEEDED
+    finally:
+        close_old_connections()
+
+
+def requeue_stale():
+    """
+    Завдання без відмітки heartbeat довше за JOB_TIMEOUT вважаються втраченими (їхній
+    run_workers упав) і проходять звичайний шлях повтору. Повертає кількість таких завдань.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.JOB_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff).values_list('id', 'worker')
+    return sum(retry_or_fail(job_id, worker, 'Job worker stopped sending heartbeats', stale_before=cutoff)
+               for job_id, worker in list(stale))
+
+
+def prune_jobs():
+    """
+    Видаляє завершені завдання, старші за JOB_RESULT_TTL, разом з їхніми файлами результатів.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.JOB_RESULT_TTL)
+    old = Job.objects.filter(status__in=[Job.SUCCEEDED, Job.FAILED], finished_at__lt=cutoff)
+    job_ids = list(old.values_list('id', flat=True))
+    for job_id in job_ids:
+        shutil.rmtree(os.path.join(settings.JOB_RESULTS_DIR, str(job_id)), ignore_errors=True)
+    with serialized_write():
+        Job.objects.filter(pk__in=job_ids).delete()
+    return len(job_ids)
+
+
+def queue_stats(minutes=60):
+    """
+    Стан черги: кількість завдань за статусами, вік найстарішого готового завдання і
+    перцентилі очікування в черзі та виконання для завершених за останні minutes хвилин.
+    """
+    now = timezone.now()
+    depth = dict(Job.objects.values_list('status').annotate(count=Count('id')))
+    ready = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    oldest = ready.aggregate(oldest=Min('run_after'))['oldest']
+    finished = Job.objects.filter(finished_at__gte=now - datetime.timedelta(minutes=minutes),
+                                  started_at__isnull=False) \
+        .values_list('run_after', 'started_at', 'finished_at')
+    waits, runs = [], []
+    for run_after, started_at, finished_at in finished:
+        waits.append(max((started_at - run_after).total_seconds(), 0) * 1000)
+        runs.append((finished_at - started_at).total_seconds() * 1000)
+    waits.sort()
+    runs.sort()
+    return {
+        'depth': {status: depth.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'ready': ready.count(),
+        'oldest_ready_seconds': (now - oldest).total_seconds() if oldest else None,
+        'finished': len(runs),
+        'wait_ms': {'p50': percentile(waits, 50), 'p95': percentile(waits, 95)},
+        'run_ms': {'p50': percentile(runs, 50), 'p95': percentile(runs, 95)},
+    }
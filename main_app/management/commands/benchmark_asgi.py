@@ -0,0 +1,144 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from main_app.instrumentation import percentile
+from main_app.models import Course, User
+
+
+SERVERS = {
+    # назва: (модуль, який має бути встановлений, команда запуску)
+    'asgi': ('uvicorn', lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'diploma_project.asgi:application', '--host', '127.0.0.1',
+        '--port', str(port), '--workers', str(workers), '--no-access-log', '--log-level', 'warning']),
+    'wsgi': ('gunicorn', lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'diploma_project.wsgi:application', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--log-level', 'warning']),
+}
+
+
+async def fetch(host, port, path, cookie):
+    """
+    Один GET з окремим з'єднанням (Connection: close): sync-воркери gunicorn не тримають
+    keep-alive, тож обидва сервери міряються однаково. Повертає (статус, мілісекунди).
+    """
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nCookie: {cookie}\r\n'
+                      f'Connection: close\r\n\r\n').encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), (time.perf_counter() - started) * 1000
+
+
+async def run_load(port, paths, cookie, connections, duration):
+    timings, statuses, errors = [], {}, 0
+    deadline = time.monotonic() + duration
+
+    async def worker(index):
+        nonlocal errors
+        i = index
+        while time.monotonic() < deadline:
+            try:
+                status, elapsed = await fetch('127.0.0.1', port, paths[i % len(paths)], cookie)
+            except (OSError, ValueError, IndexError):
+                errors += 1
+                continue
+            finally:
+                i += 1
+            statuses[status] = statuses.get(status, 0) + 1
+            timings.append(elapsed)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(index) for index in range(connections)))
+    return timings, statuses, errors, time.monotonic() - started
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Server did not start listening on port {port} in {timeout}s')
+
+
+class Command(BaseCommand):
+    help = ('Порівнює пропускну здатність async-сторінок під uvicorn (ASGI) і gunicorn (WSGI) '
+            'при заданій кількості одночасних з\'єднань')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=200)
+        parser.add_argument('--duration', type=float, default=15, help='Секунд навантаження на сервер')
+        parser.add_argument('--workers', type=int, default=2, help='Процесів сервера')
+        parser.add_argument('--warmup', type=float, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--servers', nargs='*', default=list(SERVERS), choices=list(SERVERS))
+
+    def handle(self, *args, **options):
+        paths, cookie = self.prepare()
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        if env.get('PYTHONPATH') is None:
+            env['PYTHONPATH'] = str(settings.BASE_DIR)
+
+        self.stdout.write(f'Paths: {", ".join(paths)}; {options["connections"]} connections, '
+                          f'{options["workers"]} workers, {options["duration"]}s each')
+        self.stdout.write(f'{"server":8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                          f'{"non-2xx":>10}{"errors":>8}')
+        for offset, name in enumerate(options['servers']):
+            module, command = SERVERS[name]
+            if importlib.util.find_spec(module) is None:
+                self.stdout.write(self.style.WARNING(f'{name:8}skipped: {module} is not installed'))
+                continue
+            port = options['port'] + offset
+            process = subprocess.Popen(command(port, options['workers']), cwd=settings.BASE_DIR, env=env)
+            try:
+                wait_for_port(port, process)
+                asyncio.run(run_load(port, paths, cookie, min(options['connections'], 20), options['warmup']))
+                timings, statuses, errors, elapsed = asyncio.run(
+                    run_load(port, paths, cookie, options['connections'], options['duration']))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            if not timings:
+                self.stdout.write(self.style.ERROR(f'{name:8}no successful requests, {errors} errors'))
+                continue
+            timings.sort()
+            failed = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+            self.stdout.write(f'{name:8}{len(timings) / elapsed:>10.1f}{percentile(timings, 50):>10.2f}'
+                              f'{percentile(timings, 95):>10.2f}{percentile(timings, 99):>10.2f}'
+                              f'{failed:>10}{errors:>8}')
+
+    def prepare(self):
+        """
+        Сторінки першого курсу з групами і cookie сесії його студента; сесія пишеться
+        в ту саму базу, яку читатимуть сервери.
+        """
+        course = Course.objects.filter(groups__isnull=False).order_by('id').first()
+        if course is None:
+            raise CommandError('No course with groups, seed the database first (seed_data)')
+        student = User.objects.filter(groups__courses=course).order_by('id').first()
+        client = Client()
+        client.force_login(student)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        paths = [reverse('home'), reverse('courses'), reverse('course_detail', args=[course.id]),
+                 reverse('analytics_data')]
+        return paths, cookie
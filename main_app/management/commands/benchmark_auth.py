@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from main_app.auth_backends import invalidate_user
+from main_app.models import User
+
+
+class Command(BaseCommand):
+    help = 'Вимірює накладні витрати автентифікації на запит: get_user з кешем і без'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No active users, seed the database first (seed_data)')
+        iterations = options['iterations']
+
+        request = RequestFactory().get('/courses/')
+        # Сесія в пам'яті: вимірюємо лише автентифікацію, а не сховище сесій
+        request.session = SessionBase()
+        request.session[SESSION_KEY] = str(user.pk)
+        request.session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        request.session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+
+        def uncached(i):
+            invalidate_user(user.pk)
+            return get_user(request)
+
+        def legacy_lookup(i):
+            # Попередня реалізація EmailBackend.get_user
+            return User.objects.get(pk=user.pk)
+
+        rows = [
+            self.measure('get_user, User.objects.get', legacy_lookup, iterations),
+            self.measure('get_user, cache miss', uncached, iterations),
+            self.measure('get_user, cache hit', lambda i: get_user(request), iterations),
+        ]
+        self.stdout.write(f'{"path":<30}{"p50 us":>10}{"p95 us":>10}{"queries":>10}')
+        for name, p50, p95, queries in rows:
+            self.stdout.write(f'{name:<30}{p50:>10.1f}{p95:>10.1f}{queries:>10.2f}')
+
+    def measure(self, name, func, iterations):
+        timings = []
+        with CaptureQueriesContext(connection) as context:
+            for i in range(iterations):
+                started = time.perf_counter()
+                func(i)
+                timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return name, statistics.median(timings), p95, len(context) / iterations
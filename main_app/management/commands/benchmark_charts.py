@@ -0,0 +1,89 @@
+import base64
+import io
+import os
+import resource
+import statistics
+import tempfile
+import time
+import urllib.parse
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from main_app.charts import chart_key, chart_spec, chart_url, get_chart_path
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        # ru_maxrss - це пік, а не поточне значення, але краще ніж нічого
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_inline_plot(data, title):
+    # Попередня реалізація generate_plot: pyplot у потоці запиту та base64 data URI
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    for label, values in data.items():
+        if values['value'] is not None:
+            plt.bar(label, values['value'], label=values['label'])
+    plt.title(title)
+    plt.ylabel('Середня оцінка')
+    plt.legend()
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    buf.seek(0)
+    string = base64.b64encode(buf.read())
+    uri = urllib.parse.quote(string)
+    return f'<img src="data:image/png;base64,{uri}" />'
+
+
+class Command(BaseCommand):
+    help = 'Порівнює затримку та RSS inline-рендеру діаграм з кешованим пулом воркерів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--bars', type=int, default=8)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        data = {
+            f'Практична {i}': {'value': 5 + i % 6, 'label': f'Практична {i}'}
+            for i in range(options['bars'])
+        }
+
+        rows = []
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CHART_CACHE_DIR=cache_dir):
+            def rendered(title):
+                url = chart_url(data, title)
+                get_chart_path(chart_key(chart_spec(data, title)))
+                return url
+
+            url = rendered('Warm')
+            rows.append(self.measure('cached, cold render', lambda i: rendered(f'Cold {i}'), iterations))
+            rows.append(self.measure('cached, warm', lambda i: chart_url(data, 'Warm'), iterations))
+
+        inline_html = legacy_inline_plot(data, 'Inline')
+        rows.append(self.measure('inline pyplot + base64', lambda i: legacy_inline_plot(data, f'Inline {i}'),
+                                 iterations))
+
+        self.stdout.write(f'{"path":<26}{"p50 ms":>10}{"p95 ms":>10}{"RSS +MB":>10}')
+        for name, p50, p95, rss in rows:
+            self.stdout.write(f'{name:<26}{p50:>10.2f}{p95:>10.2f}{rss:>10.1f}')
+        self.stdout.write(f'HTML per chart: inline {len(inline_html)} bytes, '
+                          f'cached {len(f"<img src={url!r} />")} bytes')
+
+    def measure(self, name, func, iterations):
+        rss_before = current_rss_mb()
+        timings = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            func(i)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return name, statistics.median(timings), p95, current_rss_mb() - rss_before
@@ -0,0 +1,155 @@
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from main_app.instrumentation import percentile
+from main_app.models import User, Course, PracticalWork
+
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Проганяє основні сторінки та REST API через тестовий клієнт, показує пропускну здатність, '
+            'перцентилі затримки й кількість запитів і порівнює їх зі збереженою базовою лінією')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Скільки запитів на сценарій')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='*', default=None, help='Запустити лише ці сценарії')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true', help='Записати результати як базову лінію')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустиме погіршення p95 відносно базової лінії (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        # Тестовий клієнт ходить на хост testserver, якого немає в ALLOWED_HOSTS робочих налаштувань
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        scenarios = self.scenarios()
+        if options['only']:
+            scenarios = [scenario for scenario in scenarios if scenario[0] in options['only']]
+
+        results = {}
+        self.stdout.write(f'{"scenario":28} {"status":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+                          f'{"p99 ms":>8} {"queries":>8}')
+        for name, client, url in scenarios:
+            result = self.run_scenario(client, url, options['requests'], options['warmup'])
+            results[name] = result
+            self.stdout.write(f'{name:28} {result["status"]:6} {result["throughput"]:8.1f} {result["p50_ms"]:8.2f} '
+                              f'{result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} {result["queries"]:8}')
+
+        # Час сторінки з помилкою нічого не каже про її швидкість, тож такий прогін не приймається
+        failed = [name for name, result in results.items() if not 200 <= result['status'] < 400]
+        if failed:
+            raise CommandError(f'Scenarios returned error statuses: {", ".join(failed)}')
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {options["baseline"]}'))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f'No baseline at {options["baseline"]}, run with --save-baseline to create one')
+            return
+        with open(options['baseline'], encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = self.compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError(f'{len(regressions)} scenarios regressed against the baseline')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def scenarios(self):
+        """
+        Сценарії на найбільшому курсі бази: анонімна головна, сторінки студента й викладача
+        та REST API з JWT.
+        """
+        course = Course.objects.annotate(submissions=Count('practicalwork__practicalworksubmission')) \
+            .filter(teachers__isnull=False, groups__isnull=False).order_by('-submissions', 'id').first()
+        if course is None:
+            raise CommandError('No course with teachers and groups, seed the database first (seed_data)')
+        teacher = course.teachers.order_by('id').first()
+        student = User.objects.filter(groups__courses=course).order_by('id').first()
+        practical = PracticalWork.objects.filter(course=course) \
+            .annotate(submissions=Count('practicalworksubmission')).order_by('-submissions', 'id').first()
+
+        # Помилки сторінок потрапляють у звіт як статус, а не обривають прогін
+        anonymous, student_client, teacher_client = (Client(raise_request_exception=False) for _ in range(3))
+        student_client.force_login(student)
+        teacher_client.force_login(teacher)
+        token = str(RefreshToken.for_user(teacher).access_token)
+        api_client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        scenarios = [
+            ('home', anonymous, reverse('home')),
+            ('courses (student)', student_client, reverse('courses')),
+            ('courses (teacher)', teacher_client, reverse('courses')),
+            ('course_detail', student_client, reverse('course_detail', args=[course.id])),
+            ('analytics', teacher_client, reverse('analytics')),
+            ('api courses', api_client, reverse('course-list')),
+            ('api tests', api_client, reverse('test-list')),
+            ('api users', api_client, reverse('user-list') + '?role=student'),
+        ]
+        if practical is not None:
+            scenarios.insert(4, ('check_practical_details', teacher_client,
+                                 reverse('check_practical_details', args=[course.id, practical.id])))
+        return scenarios
+
+    def run_scenario(self, client, url, requests, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        timings, queries = [], []
+        status = None
+        started = time.perf_counter()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - request_started) * 1000)
+            queries.append(len(context))
+            # У звіт іде перший статус помилки, навіть якщо наступні запити пройшли
+            if status is None or 200 <= status < 400:
+                status = response.status_code
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'status': status,
+            'throughput': round(requests / elapsed, 2),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+        }
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            problems = []
+            if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                problems.append(f'p95 {before["p95_ms"]} -> {result["p95_ms"]} ms')
+            if result['queries'] > before['queries']:
+                problems.append(f'queries {before["queries"]} -> {result["queries"]}')
+            if result['status'] != before['status']:
+                problems.append(f'status {before["status"]} -> {result["status"]}')
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: {", ".join(problems)}'))
+        return regressions
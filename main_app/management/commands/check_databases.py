@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.db_routing import check_database
+
+
+class Command(BaseCommand):
+    help = ('Перевіряє доступність усіх баз з DATABASES, час відповіді та відставання реплік; '
+            'придатна як health check для оркестратора')
+
+    def handle(self, *args, **options):
+        failed = []
+        for alias in settings.DATABASES:
+            result = check_database(alias)
+            lag = '-' if result['lag'] is None else f'{result["lag"]:.1f}s'
+            line = f'{alias:12} {result["latency_ms"]:8.2f} ms  lag {lag}'
+            if result['ok']:
+                self.stdout.write(f'{line}  ok')
+            else:
+                failed.append(alias)
+                self.stdout.write(self.style.ERROR(f'{line}  {result["error"]}'))
+        if failed:
+            raise CommandError(f'Unhealthy databases: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('All databases are healthy'))
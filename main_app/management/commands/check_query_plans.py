@@ -0,0 +1,87 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main_app.access import course_access_querysets
+from main_app.attendance import open_sessions
+from main_app.media import media_owner_query
+from main_app.models import User, Course, Group, PracticalWorkSubmission, Grade, AttendanceDaily, Schedule, \
+    UploadSession
+from main_app.scheduling import slot_conflict_queries
+
+
+# Плани, що читають усю таблицю: SQLite (SCAN <таблиця>) та PostgreSQL (Seq Scan on <таблиця>)
+FULL_SCAN_RE = re.compile(r'\bSCAN (?!SUBQUERY|CONSTANT ROW)(\w+)|Seq Scan on (\w+)')
+
+
+def full_scans(queryset):
+    """
+    Таблиці, які запит читає повністю, за його EXPLAIN.
+    """
+    plan = queryset.explain()
+    return sorted({table for match in FULL_SCAN_RE.finditer(plan) for table in match.groups() if table}), plan
+
+
+def hot_queries():
+    """
+    Запити з гарячих сторінок і API. Де запит будує окрема функція, перевіряється саме її
+    результат, тож план не розходиться з робочим кодом. Значення параметрів на план не впливають.
+    """
+    now = timezone.now()
+    teacher_conflicts, room_conflicts = slot_conflict_queries(1, now - datetime.timedelta(hours=2), now, '101')
+    viewable_courses, teachable_courses = course_access_querysets(1)
+    return {
+        'submission of student': PracticalWorkSubmission.objects.filter(practical_work_id=1, student_id=1),
+        'submissions of course': PracticalWorkSubmission.objects.filter(practical_work__course_id=1),
+        'graded submissions': PracticalWorkSubmission.objects.filter(practical_work_id=1, grade__isnull=False),
+        'review page': PracticalWorkSubmission.objects.filter(practical_work_id=1, student__groups__courses=1)
+        .exclude(file='').exclude(file__isnull=True),
+        'gradebook submissions': PracticalWorkSubmission.objects.filter(practical_work__course_id=1,
+                                                                        student__isnull=False)
+        .order_by('student_id'),
+        'gradebook students': User.objects.filter(groups__courses=1).order_by('id'),
+        'groups of course': Group.objects.filter(courses=1),
+        'courses of student': Course.objects.filter(groups__in=Group.objects.filter(main_app_user_group=1)).distinct(),
+        'courses of teacher': Course.objects.filter(teachers=1),
+        'course access': User.groups.through.objects.filter(user_id=1, group__courses=1),
+        'viewable courses': viewable_courses,
+        'teachable courses': teachable_courses,
+        'users by role': User.objects.filter(role='teacher').order_by('last_name', 'first_name'),
+        'test grade': Grade.objects.filter(test_id=1, student_id=1),
+        'idle attendance': open_sessions(login_time__lt=now),
+        'open attendance of user': open_sessions(user_id=1),
+        'open attendance in course': open_sessions(user_id=1, course_id=1),
+        'attendance report': AttendanceDaily.objects.filter(course_id=1, day__gte=now.date()),
+        'teacher conflicts': teacher_conflicts,
+        'room conflicts': room_conflicts,
+        'course calendar': Schedule.objects.filter(course_id=1, start_time__isnull=False).order_by('start_time'),
+        'upload session': UploadSession.objects.filter(pk='00000000-0000-0000-0000-000000000000', student_id=1),
+        'lecture material owner': media_owner_query('lecture_materials/notes.pdf'),
+        'practical work owner': media_owner_query('practical_works/task.pdf'),
+        'submission owner': media_owner_query('practical_work_submissions/report.pdf'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Виконує EXPLAIN для гарячих запитів і завершується з помилкою, якщо якийсь читає всю таблицю'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Вивести повні плани запитів')
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in hot_queries().items():
+            scans, plan = full_scans(queryset)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: full scan of {", ".join(scans)}'))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbose_plans'] or scans:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries fall back to a full table scan')
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
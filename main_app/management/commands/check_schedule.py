@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import localtime
+
+from main_app.models import Schedule
+from main_app.scheduling import find_conflicts
+
+
+class Command(BaseCommand):
+    help = 'Шукає накладки в розкладі: одна аудиторія чи один викладач у двох заняттях одночасно'
+
+    def describe(self, slot):
+        return f'#{slot.id} {localtime(slot.start_time):%Y-%m-%d %H:%M}-{localtime(slot.end_time):%H:%M}'
+
+    def handle(self, *args, **options):
+        conflicts = find_conflicts()
+        slots = Schedule.objects.in_bulk({slot_id for conflict in conflicts for slot_id in conflict[2:]})
+        for kind, resource, first_id, second_id in conflicts:
+            self.stdout.write(f'{kind} {resource}: {self.describe(slots[first_id])} overlaps {self.describe(slots[second_id])}')
+        if conflicts:
+            raise CommandError(f'{len(conflicts)} schedule conflicts')
+        self.stdout.write(self.style.SUCCESS('No schedule conflicts'))
@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_app.models import UploadSession
+from main_app.uploads import discard_session
+
+
+class Command(BaseCommand):
+    help = 'Видаляє незавершені порційні завантаження, які давно не оновлювались'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            discard_session(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} stale upload sessions'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main_app.attendance import close_idle_sessions, rebuild_attendance_daily
+
+
+class Command(BaseCommand):
+    help = 'Закриває сесії відвідуваності, що простоюють довше за таймаут, і додає їх до денних зведень'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Після закриття перерахувати денні зведення з усіх сесій')
+
+    def handle(self, *args, **options):
+        closed = close_idle_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} idle attendance sessions'))
+        if options['rebuild']:
+            rebuild_attendance_daily()
+            self.stdout.write(self.style.SUCCESS('Rebuilt daily attendance rollups'))
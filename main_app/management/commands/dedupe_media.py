@@ -0,0 +1,81 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.storage import DedupFileSystemStorage, file_sha256
+
+
+# Блоби, молодші за це (секунд), не прибираються: між збереженням блоба і os.link у _save
+# на нього ще немає посилань
+GC_MIN_AGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = ('Замінює однакові файли в MEDIA_ROOT жорсткими посиланнями на спільні блоби, а з --gc '
+            'видаляє блоби, на які не лишилось посилань')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати, скільки місця звільниться')
+        parser.add_argument('--gc', action='store_true', help='Видалити блоби без посилань')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, DedupFileSystemStorage):
+            raise CommandError('Default storage is not DedupFileSystemStorage')
+
+        blob_root = os.path.join(storage.location, storage.blob_dir)
+        files = linked = saved = 0
+        seen = set()
+        for root, dirs, filenames in os.walk(storage.location):
+            if os.path.abspath(root) == os.path.abspath(storage.location) and storage.blob_dir in dirs:
+                dirs.remove(storage.blob_dir)
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                stat = os.lstat(path)
+                if not os.path.isfile(path) or os.path.islink(path) or stat.st_nlink > 1:
+                    # Вже посилання на блоб (або не звичайний файл)
+                    continue
+                files += 1
+                sha256 = file_sha256(path)
+                blob = storage.blob_path(sha256)
+                if sha256 not in seen and not os.path.exists(blob):
+                    seen.add(sha256)
+                    if not options['dry_run']:
+                        os.makedirs(os.path.dirname(blob), exist_ok=True)
+                        os.link(path, blob)
+                    continue
+                linked += 1
+                saved += stat.st_size
+                if not options['dry_run']:
+                    tmp_path = f'{path}.dedupe'
+                    os.link(blob, tmp_path)
+                    os.replace(tmp_path, path)
+
+        verb = 'would free' if options['dry_run'] else 'freed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {files} files, blobs in {blob_root}: {linked} duplicates, {verb} {saved / 1024 / 1024:.1f} MB'
+        ))
+        if options['gc']:
+            orphans, size = self.collect_garbage(storage, blob_root, options['dry_run'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{orphans} unreferenced blobs, {verb} {size / 1024 / 1024:.1f} MB'))
+
+    def collect_garbage(self, storage, blob_root, dry_run):
+        """
+        Блоби з st_nlink == 1 - без жодного посилання з MEDIA_ROOT. Тимчасові файли
+        _store_blob і щойно збережені блоби пропускаються.
+        """
+        cutoff = time.time() - GC_MIN_AGE
+        orphans = size = 0
+        for root, dirs, filenames in os.walk(blob_root):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                stat = os.lstat(path)
+                if filename.endswith('.tmp') or stat.st_nlink != 1 or stat.st_ctime > cutoff:
+                    continue
+                if dry_run or storage.release_blob(path, stat.st_ino):
+                    orphans += 1
+                    size += stat.st_size
+        return orphans, size
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.gradebook import gradebook_csv, gradebook_rows, write_gradebook_xlsx
+from main_app.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Експортує журнал оцінок курсу в CSV або XLSX для архіву'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', help='Файл для запису (за замовчуванням stdout для CSV)')
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course_id'])
+        except Course.DoesNotExist:
+            raise CommandError(f'Course {options["course_id"]} does not exist')
+
+        rows = gradebook_rows(course)
+        output = options['output']
+        if options['format'] == 'xlsx':
+            if not output:
+                raise CommandError('--output is required for XLSX export')
+            try:
+                write_gradebook_xlsx(rows, output)
+            except ImportError:
+                raise CommandError('XLSX export requires openpyxl')
+        elif output:
+            with open(output, 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(gradebook_csv(rows))
+        else:
+            sys.stdout.writelines(gradebook_csv(rows))
+
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'Gradebook for "{course}" written to {output}'))
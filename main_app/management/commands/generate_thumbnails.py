@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from main_app.jobs import enqueue
+from main_app.models import User
+from main_app.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Генерує варіанти фото профілів для всіх користувачів з фото: одразу або, з --enqueue, '
+            'фоновими завданнями для run_workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true')
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(profile_photo='').filter(profile_photo__isnull=False).only('id', 'profile_photo')
+        count = 0
+        for user in users.iterator():
+            if options['enqueue']:
+                enqueue(generate_thumbnails, user.pk)
+            else:
+                generate_thumbnails(None, user.pk)
+            count += 1
+        action = 'Queued' if options['enqueue'] else 'Generated'
+        self.stdout.write(self.style.SUCCESS(f'{action} thumbnails for {count} users'))
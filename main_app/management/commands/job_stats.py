@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main_app.jobs import queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Показує глибину черги фонових завдань і перцентилі очікування та виконання'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='Вікно для завершених завдань')
+
+    def handle(self, *args, **options):
+        stats = queue_stats(options['minutes'])
+        depth = ', '.join(f'{status} {count}' for status, count in stats['depth'].items())
+        self.stdout.write(f'Jobs: {depth}; ready now {stats["ready"]}')
+        if stats['oldest_ready_seconds'] is not None:
+            self.stdout.write(f'Oldest ready job waits {stats["oldest_ready_seconds"]:.1f} s')
+        self.stdout.write(f'Finished in the last {options["minutes"]} min: {stats["finished"]}')
+        for name in ('wait_ms', 'run_ms'):
+            values = stats[name]
+            if values['p50'] is not None:
+                self.stdout.write(f'{name:8}p50 {values["p50"]:.1f}  p95 {values["p95"]:.1f}')
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_app.models import SubmissionReceipt
+from main_app.submissions import store_receipt
+
+
+class Command(BaseCommand):
+    help = ('Зберігає роботи з квитанцій, що лишились в обробці після перезапуску процесу; '
+            'час надходження зберігається з квитанції')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=10,
+                            help='Обробляти лише квитанції, що чекають довше за стільки хвилин')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(minutes=options['minutes'])
+        pending = SubmissionReceipt.objects.filter(status=SubmissionReceipt.PENDING, arrived_at__lt=cutoff) \
+            .order_by('arrived_at').values_list('id', flat=True)
+        stored = failed = 0
+        for receipt_id in list(pending):
+            if store_receipt(receipt_id) is None:
+                failed += 1
+            else:
+                stored += 1
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} submissions, {failed} failed'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.grade_stats import compute_grade_stats, find_drift, rebuild_grade_stats
+
+
+class Command(BaseCommand):
+    help = 'Перераховує зведені таблиці оцінок з нуля та показує розбіжності із збереженими'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Лише перевірити розбіжності, нічого не змінюючи')
+
+    def handle(self, *args, **options):
+        expected = compute_grade_stats()
+        drift = find_drift(expected)
+        for model, key, actual, wanted in drift:
+            self.stdout.write(f'{model.__name__} {key}: stored {actual}, expected {wanted}')
+
+        if options['check']:
+            if drift:
+                raise CommandError(f'{len(drift)} grade stats rows drifted')
+            self.stdout.write(self.style.SUCCESS('Grade stats are consistent'))
+            return
+
+        rebuild_grade_stats(expected)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt grade stats, fixed {len(drift)} rows'))
@@ -0,0 +1,59 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from main_app.instrumentation import percentile
+
+
+class Command(BaseCommand):
+    help = 'Зводить журнал повільних запитів у таблицю перцентилів p50/p95/p99 за view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help='Шлях до журналу (за замовчуванням REQUEST_LOG_PATH)')
+        parser.add_argument('--since', default=None, help='Враховувати лише запити після цього ISO-часу')
+        parser.add_argument('--limit', type=int, default=20, help='Скільки view показати')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.REQUEST_LOG_PATH
+        since = parse_datetime(options['since']) if options['since'] else None
+        if options['since'] and since is None:
+            raise CommandError('--since must be an ISO datetime')
+
+        totals = defaultdict(list)
+        db_times = defaultdict(list)
+        queries = defaultdict(list)
+        duplicates = defaultdict(int)
+        try:
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if since is not None and parse_datetime(entry['time']) < since:
+                        continue
+                    view = entry['view'] or entry['path']
+                    totals[view].append(entry['total_ms'])
+                    db_times[view].append(entry['db_ms'])
+                    queries[view].append(entry['queries'])
+                    duplicates[view] += bool(entry['duplicates'])
+        except FileNotFoundError:
+            raise CommandError(f'No request log at {path}')
+
+        rows = []
+        for view, values in totals.items():
+            values.sort()
+            rows.append((
+                view, len(values),
+                percentile(values, 50), percentile(values, 95), percentile(values, 99),
+                sum(db_times[view]) / len(values), sum(queries[view]) / len(values), duplicates[view],
+            ))
+        rows.sort(key=lambda row: row[3], reverse=True)
+
+        self.stdout.write(f'{"view":40} {"count":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+                          f'{"db ms":>9} {"queries":>8} {"n+1":>5}')
+        for view, count, p50, p95, p99, db_ms, query_count, with_duplicates in rows[:options['limit']]:
+            self.stdout.write(f'{view[:40]:40} {count:6} {p50:9.1f} {p95:9.1f} {p99:9.1f} '
+                              f'{db_ms:9.1f} {query_count:8.1f} {with_duplicates:5}')
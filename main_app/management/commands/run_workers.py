@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_app.jobs import claim_job, heartbeat, prune_jobs, release_job, requeue_stale, retry_or_fail, run_job
+from main_app.submissions import recover_receipts
+from main_app.workers import init_worker
+
+
+# Як часто повертати в чергу завислі завдання і квитанції та чистити старі результати, секунд
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = ('Виконує фонові завдання з таблиці jobs у пулі процесів. Кілька екземплярів можуть '
+            'працювати одночасно; SIGTERM дочікується поточних завдань, а завдання довше за '
+            'JOB_TIMEOUT перериваються разом з пулом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Вийти, коли готових завдань не лишиться')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+
+        workers = options['workers']
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        # Дочірні процеси відкривають власні з'єднання, батьківські їм не передаються
+        connections.close_all()
+        pool = self.create_pool(workers)
+        in_flight = {}
+        next_maintenance = next_heartbeat = 0
+        processed = 0
+        try:
+            while True:
+                if time.monotonic() >= next_heartbeat:
+                    # Без відмітки інший екземпляр run_workers вважатиме завдання втраченими
+                    heartbeat(worker_name, [job_id for job_id, _ in in_flight.values()])
+                    next_heartbeat = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL
+                if time.monotonic() >= next_maintenance:
+                    requeue_stale()
+                    prune_jobs()
+                    # Квитанції, які веб-процес не встиг зберегти до свого перезапуску
+                    recover_receipts()
+                    next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+
+                while not stop.is_set() and len(in_flight) < workers:
+                    job_id = claim_job(worker_name)
+                    if job_id is None:
+                        break
+                    in_flight[pool.submit(run_job, job_id)] = (job_id, time.monotonic())
+
+                if not in_flight:
+                    if stop.is_set() or options['once']:
+                        break
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id, started = in_flight.pop(future)
+                    try:
+                        status = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        status = 'failed'
+                        retry_or_fail(job_id, worker_name, 'Worker process died')
+                    except Exception as e:
+                        status = 'failed'
+                        retry_or_fail(job_id, worker_name, repr(e))
+                    processed += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'job {job_id}: {status} in {(time.monotonic() - started) * 1000:.0f} ms')
+
+                now = time.monotonic()
+                overdue = {future for future, (_, started) in in_flight.items()
+                           if now - started > settings.JOB_TIMEOUT}
+                if overdue:
+                    # Окремий процес пулу не зупинити, тож перезапускаємо весь пул: завислі завдання
+                    # йдуть на повтор, а решта повертається в чергу без витраченої спроби
+                    broken = True
+                    for future, (job_id, started) in list(in_flight.items()):
+                        del in_flight[future]
+                        if future in overdue:
+                            retry_or_fail(job_id, worker_name, f'Job exceeded JOB_TIMEOUT ({settings.JOB_TIMEOUT} s)')
+                            processed += 1
+                        else:
+                            release_job(job_id, worker_name)
+                if broken:
+                    # Після падіння процесу пул непридатний: решта його завдань теж завершиться помилкою
+                    self.terminate_pool(pool)
+                    pool = self.create_pool(workers)
+        finally:
+            pool.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
+
+    def create_pool(self, workers):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker)
+
+    def terminate_pool(self, pool):
+        # Завислий процес сам не завершиться, а публічний terminate_workers з'явився лише в Python 3.14
+        if hasattr(pool, 'terminate_workers'):
+            pool.terminate_workers()
+            return
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
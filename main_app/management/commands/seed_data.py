@@ -0,0 +1,171 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main_app.attendance import bulk_create_daily, session_buckets
+from main_app.grade_stats import rebuild_grade_stats
+from main_app.models import User, Course, Group, Module, PracticalWork, PracticalWorkSubmission, Test, \
+    TestQuestion, QuestionOption, Grade, Attendance
+
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = 'Заповнює базу синтетичним навчальним закладом заданого розміру для вимірювань продуктивності'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--teachers', type=int, default=10)
+        parser.add_argument('--groups', type=int, default=12)
+        parser.add_argument('--students-per-group', type=int, default=25)
+        parser.add_argument('--groups-per-course', type=int, default=3)
+        parser.add_argument('--practicals-per-course', type=int, default=8)
+        parser.add_argument('--tests-per-course', type=int, default=2)
+        parser.add_argument('--questions-per-test', type=int, default=10)
+        parser.add_argument('--sessions-per-student', type=int, default=30,
+                            help='Скільки сесій відвідуваності створити на студента в кожному його курсі')
+        parser.add_argument('--submit-rate', type=float, default=0.8, help='Частка зданих робіт')
+        parser.add_argument('--grade-rate', type=float, default=0.7, help='Частка оцінених серед зданих')
+        parser.add_argument('--prefix', default='seed', help='Префікс імен і email створених записів')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--random-seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(email__startswith=f'{prefix}.').exists():
+            raise CommandError(f'Users with prefix "{prefix}" already exist, pass another --prefix')
+        self.random = random.Random(options['random_seed'])
+        self.options = options
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            counts = self.seed(prefix)
+        # bulk_create не надсилає сигналів, тому зведені таблиці оцінок перераховуємо для нових курсів
+        rebuild_grade_stats(course_ids=counts.pop('course_ids'))
+
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {time.perf_counter() - started:.1f}s'))
+
+    def seed(self, prefix):
+        options, rnd = self.options, self.random
+        now = timezone.now()
+        # Хеш пароля рахується один раз: для синтетичних користувачів він однаковий
+        password = make_password(options['password'])
+
+        teachers = User.objects.bulk_create([
+            User(email=f'{prefix}.teacher{i}@example.edu', first_name='Викладач', last_name=f'{prefix} {i}',
+                 role='teacher', degree='к.т.н.', password=password)
+            for i in range(options['teachers'])
+        ], batch_size=BATCH_SIZE)
+        courses = Course.objects.bulk_create([
+            Course(title=f'{prefix} курс {i}', description=f'Синтетичний курс {i}')
+            for i in range(options['courses'])
+        ], batch_size=BATCH_SIZE)
+        Module.objects.bulk_create([
+            Module(course=course, title=f'Модуль {m + 1}', content='Зміст модуля')
+            for course in courses for m in range(3)
+        ], batch_size=BATCH_SIZE)
+        Course.teachers.through.objects.bulk_create([
+            Course.teachers.through(course_id=course.id, user_id=teacher.id)
+            for course in courses for teacher in rnd.sample(teachers, min(2, len(teachers)))
+        ], batch_size=BATCH_SIZE)
+
+        # Group успадковує auth.Group (multi-table), а такі моделі bulk_create не підтримує;
+        # груп небагато, тому створюємо їх по одній
+        groups = [Group.objects.create(name=f'{prefix}-{i}') for i in range(options['groups'])]
+        Group.courses.through.objects.bulk_create([
+            Group.courses.through(group_id=group.id, course_id=course.id)
+            for course in courses
+            for group in rnd.sample(groups, min(options['groups_per_course'], len(groups)))
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+        students = User.objects.bulk_create([
+            User(email=f'{prefix}.student{g}.{i}@example.edu', first_name=f'Студент{i}', last_name=f'{prefix} {g}',
+                 role='student', password=password)
+            for g in range(len(groups)) for i in range(options['students_per_group'])
+        ], batch_size=BATCH_SIZE)
+        group_of_student = {}
+        memberships = []
+        for index, student in enumerate(students):
+            group = groups[index // options['students_per_group']]
+            group_of_student[student.id] = group.id
+            memberships.append(User.groups.through(user_id=student.id, group_id=group.id))
+        User.groups.through.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
+
+        students_by_course = {course.id: [] for course in courses}
+        students_by_group = {}
+        for student in students:
+            students_by_group.setdefault(group_of_student[student.id], []).append(student.id)
+        for group_id, course_id in Group.courses.through.objects.filter(group__in=groups) \
+                .values_list('group_id', 'course_id'):
+            students_by_course[course_id].extend(students_by_group.get(group_id, []))
+
+        practicals = PracticalWork.objects.bulk_create([
+            PracticalWork(course=course, title=f'Практична {p + 1}', content='Завдання',
+                          file=f'practical_works/{prefix}/{course.id}-{p + 1}.pdf',
+                          deadline=now + datetime.timedelta(days=7 * (p - options['practicals_per_course'] // 2)))
+            for course in courses for p in range(options['practicals_per_course'])
+        ], batch_size=BATCH_SIZE)
+
+        submissions = []
+        for practical in practicals:
+            for student_id in students_by_course[practical.course_id]:
+                if rnd.random() >= options['submit_rate']:
+                    continue
+                graded = rnd.random() < options['grade_rate']
+                submissions.append(PracticalWorkSubmission(
+                    practical_work=practical, student_id=student_id,
+                    file=f'practical_work_submissions/{prefix}/{practical.id}-{student_id}.pdf',
+                    grade=rnd.randint(2, 10) if graded else None,
+                    grade_date=now if graded else None,
+                ))
+        PracticalWorkSubmission.objects.bulk_create(submissions, batch_size=BATCH_SIZE)
+
+        tests = Test.objects.bulk_create([
+            Test(course=course, title=f'Тест {t + 1}')
+            for course in courses for t in range(options['tests_per_course'])
+        ], batch_size=BATCH_SIZE)
+        questions = TestQuestion.objects.bulk_create([
+            TestQuestion(test=test, content=f'Питання {q + 1}', is_multiple_choice=q % 3 == 0)
+            for test in tests for q in range(options['questions_per_test'])
+        ], batch_size=BATCH_SIZE)
+        QuestionOption.objects.bulk_create([
+            QuestionOption(question=question, content=f'Варіант {o + 1}',
+                           is_correct=o == 0 or (question.is_multiple_choice and o == 1))
+            for question in questions for o in range(4)
+        ], batch_size=BATCH_SIZE)
+        grades = Grade.objects.bulk_create([
+            Grade(student_id=student_id, course_id=test.course_id, test=test, score=rnd.randint(3, 10))
+            for test in tests for student_id in students_by_course[test.course_id] if rnd.random() < 0.6
+        ], batch_size=BATCH_SIZE)
+
+        sessions = []
+        for course in courses:
+            for student_id in students_by_course[course.id]:
+                for _ in range(options['sessions_per_student']):
+                    login_time = now - datetime.timedelta(days=rnd.randint(1, 120), minutes=rnd.randint(0, 1440))
+                    sessions.append(Attendance(user_id=student_id, course=course, login_time=login_time,
+                                               logout_time=login_time + datetime.timedelta(minutes=rnd.randint(5, 90))))
+        Attendance.objects.bulk_create(sessions, batch_size=BATCH_SIZE)
+        # Курси нові, тож денних зведень для них ще немає і їх можна вставити одним bulk_create
+        bulk_create_daily(session_buckets(
+            (row.user_id, row.course_id, row.login_time, row.logout_time) for row in sessions))
+
+        return {
+            'course_ids': [course.id for course in courses],
+            'courses': len(courses),
+            'teachers': len(teachers),
+            'groups': len(groups),
+            'students': len(students),
+            'practicals': len(practicals),
+            'submissions': len(submissions),
+            'tests': len(tests),
+            'test grades': len(grades),
+            'attendance sessions': len(sessions),
+        }
@@ -0,0 +1,136 @@
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .access import can_teach, can_view
+from .models import LectureMaterial, PracticalWork, PracticalWorkSubmission
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_owner_query(name):
+    """
+    Запит власника файлу за його ім'ям у сховищі: course_id матеріалу чи практичної або
+    (student_id, course_id) зданої роботи. None - для каталогів без власника в базі.
+    """
+    if name.startswith('lecture_materials/'):
+        return LectureMaterial.objects.filter(file=name).values_list('course_id', flat=True)
+    if name.startswith('practical_works/'):
+        return PracticalWork.objects.filter(file=name).values_list('course_id', flat=True)
+    if name.startswith('practical_work_submissions/'):
+        return PracticalWorkSubmission.objects.filter(file=name).values_list('student_id', 'practical_work__course_id')
+    return None
+
+
+def can_access_media(user, name):
+    """
+    Фото профілів і їхні варіанти показуються всім (картки викладачів на сторінці курсу),
+    матеріали курсу - його групам і викладачам, а здані роботи - самому студенту та викладачам курсу.
+    """
+    if name.startswith(('profile_photos/', f'{settings.THUMBNAIL_DIR}/')):
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    query = media_owner_query(name)
+    if query is None:
+        return False
+    owner = query.first()
+    if name.startswith('practical_work_submissions/'):
+        if owner is None:
+            return False
+        student_id, course_id = owner
+        return student_id == user.pk or can_teach(user, course_id)
+    return can_view(user, owner)
+
+
+def file_etag(stat):
+    return quote_etag(f'{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+class RangeFile:
+    """
+    Обгортка, що віддає лише length байтів з поточної позиції файлу. fileno() лишається
+    доступним, тож wsgi.file_wrapper (gunicorn) надсилає діапазон через sendfile.
+    """
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.name = fh.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header, size):
+    """
+    Повертає (start, end) включно для одного діапазону bytes=, None якщо заголовок
+    відсутній або складніший, ніж ми підтримуємо, і False якщо діапазон незадовольнимий.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def file_response(request, path, stat, etag):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range == etag or parse_http_date_safe(if_range) == int(stat.st_mtime):
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    fh = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        fh.seek(start)
+        response = FileResponse(RangeFile(fh, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def accel_redirect_response(prefix, name, etag, stat):
+    response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['ETag'] = etag
+    return response
@@ -1,7 +1,35 @@
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse, resolve
+from django.utils import timezone
 from django.conf import settings
 
+from .attendance import record_activity
+from .db_routing import RoutingState, choose_replica, routing_state
+from .instrumentation import RequestMetrics, current_metrics, log_request
+
+
+class ArrivalTimeMiddleware:
+    """
+    Записує в request.arrived_at час надходження запиту, до читання тіла і будь-яких черг.
+    За ним визначається, чи здана робота до дедлайну (див. main_app/submissions.py).
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.arrived_at = timezone.now()
+        return self.get_response(request)
+
 
 class LoginRequiredMiddleware:
     """
@@ -18,3 +46,135 @@ class LoginRequiredMiddleware:
                 return redirect(settings.LOGIN_URL)
         response = self.get_response(request)
         return response
+
+
+class AttendanceMiddleware:
+    """
+    Відмічає присутність користувача в курсі для кожної сторінки з course_id в URL.
+    Під ASGI process_view виконується в потоці запиту, тож працює і з async-представленнями.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        course_id = view_kwargs.get('course_id')
+        if course_id is not None and request.user.is_authenticated:
+            record_activity(request.user.pk, course_id)
+        return None
+
+
+class InstrumentationMiddleware:
+    """
+    Збирає для кожного запиту кількість і час SQL-запитів, повторювані запити (N+1) та час
+    рендерингу шаблонів (його рахує бекенд шаблонів InstrumentedDjangoTemplates). Підсумок
+    іде в заголовок Server-Timing, а повільні запити - в журнал REQUEST_LOG_PATH (див. команду
+    request_stats).
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def wrap_connections(self, stack, metrics):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.record_query))
+
+    def finish(self, request, response, metrics):
+        total = metrics.total_time
+        response['Server-Timing'] = metrics.server_timing(total)
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            log_request(request, response, metrics, total)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        # З'єднання з базою прив'язані до потоку, а ORM async-представлень працює в потоці
+        # запиту (sync_to_async), тож обгортки ставимо й знімаємо саме там
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Відправляє читання GET-сторінок з DATABASE_REPLICA_VIEWS на репліку. Після POST (та інших
+    змінних методів) клієнт отримує cookie, і наступні DATABASE_STICKY_SECONDS секунд його
+    читання йдуть в основну базу, щоб він бачив власні зміни попри відставання репліки.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.DATABASE_STICKY_COOKIE, '1', max_age=settings.DATABASE_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routing_state.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = routing_state.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.finish(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and settings.DATABASE_STICKY_COOKIE not in request.COOKIES
+                and request.resolver_match.url_name in settings.DATABASE_REPLICA_VIEWS):
+            state = routing_state.get()
+            if state is not None and not state.wrote:
+                # Сесію й користувача читаємо з основної бази до перемикання: щойно створена
+                # сесія могла ще не дійти до репліки
+                if hasattr(request, 'user'):
+                    request.user.is_authenticated
+                state.alias = choose_replica()
+        return None
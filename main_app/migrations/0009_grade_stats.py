@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_grade_stats(apps, schema_editor):
+    PracticalWorkSubmission = apps.get_model('main_app', 'PracticalWorkSubmission')
+    PracticalGradeStats = apps.get_model('main_app', 'PracticalGradeStats')
+    CourseGradeStats = apps.get_model('main_app', 'CourseGradeStats')
+    GroupGradeStats = apps.get_model('main_app', 'GroupGradeStats')
+
+    aggregates = {
+        'count': Count('grade'),
+        'total': Coalesce(Sum('grade'), 0),
+        'total_squares': Coalesce(Sum(F('grade') * F('grade')), 0),
+        'min_grade': Min('grade'),
+        'max_grade': Max('grade'),
+    }
+    graded = PracticalWorkSubmission.objects.filter(grade__isnull=False)
+    PracticalGradeStats.objects.bulk_create(
+        PracticalGradeStats(**row)
+        for row in graded.filter(practical_work__isnull=False).values('practical_work_id').annotate(**aggregates)
+    )
+    CourseGradeStats.objects.bulk_create(
+        CourseGradeStats(**row)
+        for row in graded.filter(practical_work__course__isnull=False)
+        .values(course_id=F('practical_work__course')).annotate(**aggregates)
+    )
+    GroupGradeStats.objects.bulk_create(
+        GroupGradeStats(**row)
+        for row in graded.filter(student__groups__courses=F('practical_work__course'))
+        .values(course_id=F('practical_work__course'), group_id=F('student__groups')).annotate(**aggregates)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_practicalwork_max_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseGradeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('total_squares', models.BigIntegerField(default=0)),
+                ('min_grade', models.IntegerField(blank=True, null=True)),
+                ('max_grade', models.IntegerField(blank=True, null=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grade_stats', to='main_app.course')),
+            ],
+            options={
+                'db_table': 'course_grade_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='PracticalGradeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('total_squares', models.BigIntegerField(default=0)),
+                ('min_grade', models.IntegerField(blank=True, null=True)),
+                ('max_grade', models.IntegerField(blank=True, null=True)),
+                ('practical_work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grade_stats', to='main_app.practicalwork')),
+            ],
+            options={
+                'db_table': 'practical_grade_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupGradeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('total_squares', models.BigIntegerField(default=0)),
+                ('min_grade', models.IntegerField(blank=True, null=True)),
+                ('max_grade', models.IntegerField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_grade_stats', to='main_app.course')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_stats', to='main_app.group')),
+            ],
+            options={
+                'db_table': 'group_grade_stats',
+                'unique_together': {('course', 'group')},
+            },
+        ),
+        migrations.RunPython(populate_grade_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_upload_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lecturematerial',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='lecture_materials/'),
+        ),
+        migrations.AlterField(
+            model_name='practicalwork',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='practical_works/'),
+        ),
+        migrations.AlterField(
+            model_name='practicalworksubmission',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='practical_work_submissions/'),
+        ),
+    ]
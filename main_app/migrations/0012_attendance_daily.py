@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_media_file_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AttendanceDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('duration', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_daily', to='main_app.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_daily', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'attendance_daily',
+                'unique_together': {('user', 'course', 'day')},
+            },
+        ),
+    ]
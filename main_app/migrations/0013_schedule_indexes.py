@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_attendance_daily'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['location', 'start_time'], name='schedule_location_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['course', 'start_time'], name='schedule_course_start_idx'),
+        ),
+    ]
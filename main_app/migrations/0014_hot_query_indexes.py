@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main_app', '0013_schedule_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('logout_time__isnull', True)), fields=['login_time'], name='attendance_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('logout_time__isnull', True)), fields=['user', 'course'], name='attendance_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancedaily',
+            index=models.Index(fields=['course', 'day'], name='attendance_daily_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['test', 'student'], name='grades_test_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='practicalworksubmission',
+            index=models.Index(condition=models.Q(('grade__isnull', False)), fields=['practical_work', 'grade'], name='submissions_graded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'last_name', 'first_name'], name='users_role_name_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:53
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+
+def populate_submission_stats(apps, schema_editor):
+    PracticalWorkSubmission = apps.get_model('main_app', 'PracticalWorkSubmission')
+    PracticalSubmissionStats = apps.get_model('main_app', 'PracticalSubmissionStats')
+
+    # Для вже зданих робіт час надходження - submitted_at
+    submitted = PracticalWorkSubmission.objects.exclude(file='').filter(file__isnull=False)
+    submitted.filter(practical_work__deadline__lt=F('submitted_at')).update(is_late=True)
+    submitted.filter(is_late__isnull=True).update(is_late=False)
+    PracticalSubmissionStats.objects.bulk_create(
+        PracticalSubmissionStats(**row)
+        for row in submitted.filter(practical_work__isnull=False).values('practical_work_id').annotate(
+            on_time=Count('id', filter=Q(is_late=False)),
+            late=Count('id', filter=Q(is_late=True)),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='practicalworksubmission',
+            name='is_late',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PracticalSubmissionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_time', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('practical_work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='submission_stats', to='main_app.practicalwork')),
+            ],
+            options={
+                'db_table': 'practical_submission_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubmissionReceipt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('arrived_at', models.DateTimeField()),
+                ('is_late', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pending', 'В обробці'), ('stored', 'Збережено'), ('failed', 'Помилка')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('stored_at', models.DateTimeField(blank=True, null=True)),
+                ('practical_work', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.practicalwork')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main_app.practicalworksubmission')),
+            ],
+            options={
+                'db_table': 'submission_receipts',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['arrived_at'], name='receipts_pending_idx')],
+            },
+        ),
+        migrations.RunPython(populate_submission_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group as AuthGroup
 
@@ -102,8 +104,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def drop_password_hash(self):
+        """
+        Запам'ятовує хеш сесії і відкладає поле password, щоб екземпляр можна було покласти
+        в спільний кеш без хешу пароля (див. main_app.auth_backends). Звернення до password
+        перечитає його з бази.
+        """
+        self._session_auth_hash = self.get_session_auth_hash()
+        self.__dict__.pop('password', None)
+
+    def get_session_auth_hash(self):
+        # Після set_password чи перечитування пароль знову в __dict__, і хеш рахується заново
+        if 'password' not in self.__dict__ and getattr(self, '_session_auth_hash', None):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
     class Meta:
         db_table = 'users'
+        indexes = [
+            models.Index(fields=['role', 'last_name', 'first_name'], name='users_role_name_idx'),
+        ]
 
 
 
@@ -113,13 +133,16 @@ class PracticalWork(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True, null=True)
     course = models.ForeignKey(Course, models.CASCADE, blank=True, null=True)
-    file = models.FileField(upload_to='practical_works/', blank=True, null=True)
+    file = models.FileField(upload_to='practical_works/', blank=True, null=True, db_index=True)
     deadline = models.DateTimeField(blank=True, null=True)
     max_score = models.FloatField(default=10.0)
 
     def __str__(self):
         return self.title
 
+    def is_late(self, arrived_at):
+        return self.deadline is not None and arrived_at > self.deadline
+
     class Meta:
         db_table = 'practical_works'
 
@@ -128,7 +151,7 @@ class LectureMaterial(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=255)
     course = models.ForeignKey(Course, models.CASCADE, blank=True, null=True)
-    file = models.FileField(upload_to='lecture_materials/', blank=True, null=True)
+    file = models.FileField(upload_to='lecture_materials/', blank=True, null=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -141,8 +164,10 @@ class PracticalWorkSubmission(models.Model):
     id = models.AutoField(primary_key=True)
     practical_work = models.ForeignKey(PracticalWork, models.CASCADE, blank=True, null=True)
     student = models.ForeignKey(User, models.CASCADE, blank=True, null=True, limit_choices_to={'role': 'student'})
-    file = models.FileField(upload_to='practical_work_submissions/', blank=True, null=True)
+    file = models.FileField(upload_to='practical_work_submissions/', blank=True, null=True, db_index=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Чи надійшов останній файл після дедлайну; None - файлу ще немає
+    is_late = models.BooleanField(null=True, blank=True)
     grade = models.IntegerField(blank=True, null=True)
     grade_date = models.DateTimeField(null=True, blank=True)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -154,6 +179,65 @@ class PracticalWorkSubmission(models.Model):
     class Meta:
         db_table = 'practical_work_submissions'
         unique_together = ('practical_work', 'student')
+        indexes = [
+            # Лише оцінені роботи: середні, журнали та перерахунок зведених таблиць
+            models.Index(fields=['practical_work', 'grade'], condition=models.Q(grade__isnull=False),
+                         name='submissions_graded_idx'),
+        ]
+
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    practical_work = models.ForeignKey(PracticalWork, models.CASCADE)
+    student = models.ForeignKey(User, models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student} upload of {self.filename}"
+
+    class Meta:
+        db_table = 'upload_sessions'
+
+
+class SubmissionReceipt(models.Model):
+    """
+    Квитанція про прийняту роботу: час надходження фіксується при вході запиту, а файл
+    зберігається у фоновому пулі (див. main_app/submissions.py). Студент опитує статус за id.
+    """
+    PENDING = 'pending'
+    STORED = 'stored'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В обробці'),
+        (STORED, 'Збережено'),
+        (FAILED, 'Помилка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    practical_work = models.ForeignKey(PracticalWork, models.CASCADE)
+    student = models.ForeignKey(User, models.CASCADE)
+    filename = models.CharField(max_length=255)
+    arrived_at = models.DateTimeField()
+    is_late = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    submission = models.ForeignKey(PracticalWorkSubmission, models.SET_NULL, blank=True, null=True)
+    stored_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.student} receipt for {self.practical_work}"
+
+    class Meta:
+        db_table = 'submission_receipts'
+        indexes = [
+            # Незавершені квитанції: відновлення після перезапуску
+            models.Index(fields=['arrived_at'], condition=models.Q(status='pending'),
+                         name='receipts_pending_idx'),
+        ]
 
 
 class Test(models.Model):
@@ -216,6 +300,10 @@ class Schedule(models.Model):
 
     class Meta:
         db_table = 'schedule'
+        indexes = [
+            models.Index(fields=['location', 'start_time'], name='schedule_location_start_idx'),
+            models.Index(fields=['course', 'start_time'], name='schedule_course_start_idx'),
+        ]
 
 class Attendance(models.Model):
     id = models.AutoField(primary_key=True)
@@ -223,12 +311,21 @@ class Attendance(models.Model):
     course = models.ForeignKey(Course, models.CASCADE, blank=True, null=True)
     login_time = models.DateTimeField(blank=True, null=True)
     logout_time = models.DateTimeField(blank=True, null=True)
+    # Остання активність відкритої сесії з точністю до ATTENDANCE_PERSIST_INTERVAL; точне значення - в кеші
+    last_seen = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.user} attendance in {self.course}"
 
     class Meta:
         db_table = 'attendance'
+        indexes = [
+            # Відкриті сесії: закриття за таймаутом і при виході користувача
+            models.Index(fields=['login_time'], condition=models.Q(logout_time__isnull=True),
+                         name='attendance_open_idx'),
+            models.Index(fields=['user', 'course'], condition=models.Q(logout_time__isnull=True),
+                         name='attendance_user_open_idx'),
+        ]
 
 class Grade(models.Model):
     id = models.AutoField(primary_key=True)
@@ -243,3 +340,143 @@ class Grade(models.Model):
 
     class Meta:
         db_table = 'grades'
+        indexes = [
+            models.Index(fields=['test', 'student'], name='grades_test_student_idx'),
+        ]
+
+
+class GradeStats(models.Model):
+    count = models.IntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    total_squares = models.BigIntegerField(default=0)
+    min_grade = models.IntegerField(blank=True, null=True)
+    max_grade = models.IntegerField(blank=True, null=True)
+
+    @property
+    def avg_grade(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return self.total_squares / self.count - mean * mean
+
+    class Meta:
+        abstract = True
+
+
+class PracticalGradeStats(GradeStats):
+    practical_work = models.OneToOneField(PracticalWork, models.CASCADE, related_name='grade_stats')
+
+    def __str__(self):
+        return f"{self.practical_work} stats"
+
+    class Meta:
+        db_table = 'practical_grade_stats'
+
+
+class PracticalSubmissionStats(models.Model):
+    """
+    Лічильник зданих вчасно і з запізненням робіт практичної; оновлюється приростами
+    при збереженні чи видаленні роботи, без перерахунку таблиці.
+    """
+    practical_work = models.OneToOneField(PracticalWork, models.CASCADE, related_name='submission_stats')
+    on_time = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.practical_work} submissions"
+
+    class Meta:
+        db_table = 'practical_submission_stats'
+
+
+class CourseGradeStats(GradeStats):
+    course = models.OneToOneField(Course, models.CASCADE, related_name='grade_stats')
+
+    def __str__(self):
+        return f"{self.course} stats"
+
+    class Meta:
+        db_table = 'course_grade_stats'
+
+
+class GroupGradeStats(GradeStats):
+    course = models.ForeignKey(Course, models.CASCADE, related_name='group_grade_stats')
+    group = models.ForeignKey(Group, models.CASCADE, related_name='grade_stats')
+
+    def __str__(self):
+        return f"{self.group} stats in {self.course}"
+
+    class Meta:
+        db_table = 'group_grade_stats'
+        unique_together = ('course', 'group')
+
+
+class AttendanceDaily(models.Model):
+    user = models.ForeignKey(User, models.CASCADE, related_name='attendance_daily')
+    course = models.ForeignKey(Course, models.CASCADE, related_name='attendance_daily')
+    day = models.DateField()
+    duration = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} attendance in {self.course} on {self.day}"
+
+    class Meta:
+        db_table = 'attendance_daily'
+        unique_together = ('user', 'course', 'day')
+        indexes = [
+            models.Index(fields=['course', 'day'], name='attendance_daily_day_idx'),
+        ]
+
+
+class Job(models.Model):
+    """
+    Фонове завдання для run_workers: функція з main_app.jobs.task і її аргументи в JSON.
+    Готові завдання беруться за спаданням priority, результат лишається в result.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В черзі'),
+        (RUNNING, 'Виконується'),
+        (SUCCEEDED, 'Виконано'),
+        (FAILED, 'Помилка'),
+    ]
+
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(User, models.SET_NULL, blank=True, null=True, related_name='jobs')
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField()
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Остання відмітка run_workers, що завдання ще виконується
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            # Вибірка наступного завдання: лише ті, що в черзі
+            models.Index(fields=['-priority', 'run_after'], condition=models.Q(status='queued'),
+                         name='jobs_queued_idx'),
+            models.Index(fields=['status', 'finished_at'], name='jobs_finished_idx'),
+        ]
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Курсор по первинному ключу: сторінка будь-якої глибини - це один запит з WHERE id > ... LIMIT
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
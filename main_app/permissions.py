@@ -1,5 +1,8 @@
 from rest_framework import permissions
 
+from .access import can_teach, can_view
+from .models import Course
+
 # Дозвіл тільки для адміністраторів, для інших тільки читання.
 class IsAdminOrReadOnly(permissions.BasePermission):
 
@@ -8,3 +11,22 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         return request.user and request.user.is_staff
+
+
+class CourseAccessPermission(permissions.BasePermission):
+    """
+    Курси як каталог бачать усі, а змінювати їх можуть лише викладачі курсу. Решту об'єктів
+    курсу (тести) читають ті, хто має доступ до курсу, і змінюють його викладачі.
+    """
+
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS or getattr(view, 'action', None) != 'create':
+            return True
+        # Курс створюють викладачі; право на курс тесту перевіряє perform_create
+        return view.queryset.model is not Course or request.user.is_staff or request.user.role == 'teacher'
+
+    def has_object_permission(self, request, view, obj):
+        course_id = obj.pk if isinstance(obj, Course) else obj.course_id
+        if request.method in permissions.SAFE_METHODS:
+            return isinstance(obj, Course) or can_view(request.user, course_id)
+        return can_teach(request.user, course_id)
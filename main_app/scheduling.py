@@ -0,0 +1,224 @@
+import datetime
+import hashlib
+import heapq
+import uuid
+from collections import defaultdict
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+
+from .models import Course, Schedule, User
+
+
+FEED_SALT = 'main_app.calendar_feed'
+
+
+def teachers_by_course(course_ids=None):
+    rows = Course.teachers.through.objects.all()
+    if course_ids is not None:
+        rows = rows.filter(course_id__in=course_ids)
+    teachers = defaultdict(set)
+    for course_id, user_id in rows.values_list('course_id', 'user_id'):
+        teachers[course_id].add(user_id)
+    return teachers
+
+
+def find_conflicts(start=None, end=None):
+    """
+    Усі накладки розкладу: одна аудиторія або один викладач у двох заняттях одночасно.
+
+    Заняття проходять одним прохідом, відсортованим за початком; для кожної аудиторії та
+    викладача тримається купа поточних занять за часом завершення, тож порівнюються лише
+    ті заняття, що справді перетинаються, а не всі пари. Повертає список
+    (вид ресурсу, ресурс, id першого заняття, id другого).
+    """
+    slots = Schedule.objects.filter(start_time__isnull=False, end_time__isnull=False)
+    if start is not None:
+        slots = slots.filter(end_time__gt=start)
+    if end is not None:
+        slots = slots.filter(start_time__lt=end)
+    slots = list(slots.order_by('start_time', 'id').values_list('id', 'course_id', 'start_time', 'end_time', 'location'))
+    teachers = teachers_by_course({slot[1] for slot in slots})
+
+    active = defaultdict(list)
+    conflicts = []
+    for slot_id, course_id, slot_start, slot_end, location in slots:
+        resources = [('teacher', teacher_id) for teacher_id in sorted(teachers.get(course_id, ()))]
+        if location:
+            resources.append(('location', location))
+        for resource in resources:
+            heap = active[resource]
+            while heap and heap[0][0] <= slot_start:
+                heapq.heappop(heap)
+            conflicts.extend((*resource, other_id, slot_id) for _, other_id in sorted(heap, key=lambda item: item[1]))
+            heapq.heappush(heap, (slot_end, slot_id))
+    return conflicts
+
+
+def slot_conflict_queries(course_id, start, end, location=None):
+    """
+    Запити занять, що перетинаються з [start, end): з викладачами курсу за індексом
+    (course, start_time) і, якщо задано аудиторію, в ній за індексом (location, start_time).
+    Окремі запити, бо OR цих умов SQLite виконує повним переглядом schedule.
+    """
+    overlapping = Schedule.objects.filter(start_time__lt=end, end_time__gt=start)
+    teachers = Course.teachers.through.objects.filter(course_id=course_id).values('user_id')
+    teacher_courses = Course.teachers.through.objects.filter(user_id__in=teachers).values('course_id')
+    queries = [overlapping.filter(course_id__in=teacher_courses)]
+    if location:
+        queries.append(overlapping.filter(location=location))
+    return queries
+
+
+def slot_conflicts(course_id, start, end, location=None, exclude_id=None):
+    """
+    Заняття, що перетинаються з [start, end) в тій самій аудиторії або з тим самим викладачем,
+    за початком. Результати запитів slot_conflict_queries об'єднуються без повторів.
+    """
+    conflicts = {}
+    for query in slot_conflict_queries(course_id, start, end, location):
+        if exclude_id is not None:
+            query = query.exclude(pk=exclude_id)
+        conflicts.update((slot.id, slot) for slot in query.select_related('course'))
+    return sorted(conflicts.values(), key=lambda slot: (slot.start_time, slot.id))
+
+
+def schedule_version_key(course_id):
+    return f'schedule_version:{course_id}'
+
+
+def schedule_versions(course_ids):
+    keys = {schedule_version_key(course_id): course_id for course_id in course_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    missing = {key: uuid.uuid4().hex for key, course_id in keys.items() if course_id not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update({keys[key]: version for key, version in missing.items()})
+    return versions
+
+
+def invalidate_schedule(*course_ids):
+    cache.set_many({schedule_version_key(course_id): uuid.uuid4().hex
+                    for course_id in course_ids if course_id is not None}, None)
+
+
+def calendar_etag(course_ids, versions, kind):
+    digest = hashlib.sha256(kind.encode())
+    for course_id in course_ids:
+        digest.update(f'{course_id}:{versions[course_id]};'.encode())
+    return quote_etag(digest.hexdigest()[:32])
+
+
+def calendar_bound(value, upper=False):
+    """
+    Межа періоду календаря з ISO-дати чи дати й часу. Дата як верхня межа включає весь день.
+    """
+    day = parse_date(value)
+    if day is not None:
+        if upper:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time())
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Invalid date: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def ics_escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_line(line):
+    # Рядки iCalendar довші за 75 байтів переносяться з пробілом на початку продовження
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, current = [], b''
+    for char in line:
+        char_bytes = char.encode()
+        if len(current) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(current.decode())
+            current = b''
+        current += char_bytes
+    parts.append(current.decode())
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_time(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_course_events(course_id):
+    """
+    Заняття курсу у двох виглядах: список для JSON API та готові блоки VEVENT.
+    """
+    slots = Schedule.objects.filter(course_id=course_id, start_time__isnull=False, end_time__isnull=False) \
+        .select_related('course').order_by('start_time', 'id')
+    stamp = ics_time(timezone.now())
+    events, ics = [], []
+    for slot in slots:
+        events.append({
+            'id': slot.id,
+            'course': course_id,
+            'title': slot.course.title,
+            'start': slot.start_time,
+            'end': slot.end_time,
+            'location': slot.location,
+        })
+        ics.append(''.join(ics_line(line) for line in [
+            'BEGIN:VEVENT',
+            f'UID:schedule-{slot.id}@diploma_project',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{ics_time(slot.start_time)}',
+            f'DTEND:{ics_time(slot.end_time)}',
+            f'SUMMARY:{ics_escape(slot.course.title)}',
+            *([f'LOCATION:{ics_escape(slot.location)}'] if slot.location else []),
+            'END:VEVENT',
+        ]))
+    return {'events': events, 'ics': ''.join(ics)}
+
+
+def course_events(course_ids, versions):
+    """
+    Заняття курсів з кешу. Ключ містить версію розкладу курсу, тому після зміни
+    перебудовуються лише курси, чий розклад змінився.
+    """
+    keys = {f'schedule_events:{course_id}:{versions[course_id]}': course_id for course_id in course_ids}
+    cached = cache.get_many(keys)
+    fresh = {}
+    for key, course_id in keys.items():
+        if key not in cached:
+            fresh[key] = render_course_events(course_id)
+    if fresh:
+        cache.set_many(fresh)
+    cached.update(fresh)
+    return {course_id: cached[key] for key, course_id in keys.items()}
+
+
+def calendar_ics(course_events_by_id):
+    return (
+        'BEGIN:VCALENDAR\r\n'
+        'VERSION:2.0\r\n'
+        'PRODID:-//diploma_project//schedule//UK\r\n'
+        'CALSCALE:GREGORIAN\r\n'
+        + ''.join(course_events_by_id[course_id]['ics'] for course_id in sorted(course_events_by_id))
+        + 'END:VCALENDAR\r\n'
+    )
+
+
+def feed_token(user):
+    return signing.Signer(salt=FEED_SALT).sign(str(user.pk))
+
+
+def user_from_feed_token(token):
+    try:
+        user_id = signing.Signer(salt=FEED_SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
@@ -1,7 +1,29 @@
 from rest_framework import serializers
-from .models import User, Course, PracticalWork, Test, TestQuestion, QuestionOption, Review, Schedule, Attendance, Grade
+from rest_framework.permissions import SAFE_METHODS
+from .models import User, Course, PracticalWork, Test, TestQuestion, QuestionOption, Review, Schedule, Attendance, Grade, \
+    UploadSession, SubmissionReceipt, Job
 
-class UserSerializer(serializers.ModelSerializer):
+
+def requested_fields(request):
+    """
+    Поля з ?fields=id,title для GET-запитів, або None якщо параметр не заданий.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = {name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()}
+    return fields or None
+
+
+class SparseFieldsetMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'first_name', 'last_name', 'role', 'bio', 'phone_number', 'degree', 'profile_photo', 'password')
@@ -23,14 +45,62 @@ class UserSerializer(serializers.ModelSerializer):
         )
         return user
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = '__all__'
 
 
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Test
         fields = '__all__'
+
+
+class GradebookSerializer(serializers.Serializer):
+    grades = serializers.DictField(child=serializers.IntegerField(allow_null=True))
+
+    def validate_grades(self, value):
+        try:
+            return {int(submission_id): grade for submission_id, grade in value.items()}
+        except ValueError:
+            raise serializers.ValidationError('Keys must be submission ids.')
+
+
+class TestAttemptsSerializer(serializers.Serializer):
+    attempts = serializers.DictField(
+        child=serializers.DictField(child=serializers.ListField(child=serializers.IntegerField())))
+
+    def validate_attempts(self, value):
+        try:
+            return {
+                int(student_id): {int(question_id): set(options) for question_id, options in answers.items()}
+                for student_id, answers in value.items()
+            }
+        except ValueError:
+            raise serializers.ValidationError('Keys must be student and question ids.')
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'filename', 'size', 'offset')
+        read_only_fields = ('id', 'offset')
+
+
+class SubmissionReceiptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionReceipt
+        fields = ('id', 'practical_work', 'filename', 'arrived_at', 'is_late', 'status', 'error', 'submission',
+                  'stored_at')
+        read_only_fields = fields
+
+
+class JobSerializer(serializers.ModelSerializer):
+    # Текст помилки - трасування з воркера, тож назовні віддається лише статус
+    class Meta:
+        model = Job
+        fields = ('id', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'result', 'created_at',
+                  'started_at', 'finished_at')
+        read_only_fields = fields
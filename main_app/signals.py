@@ -0,0 +1,235 @@
+from functools import partial
+
+from django.contrib.auth.models import Group as AuthGroup
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .access import invalidate_all_course_access, invalidate_course_access
+from .attendance import close_user_sessions
+from .auth_backends import invalidate_all_users, invalidate_user
+from .autograde import invalidate_answer_key
+from .course_cache import invalidate_course
+from .grade_stats import apply_grade_changes, refresh_course_stats
+from .scheduling import invalidate_schedule
+from .submissions import apply_lateness_change
+from .jobs import enqueue
+from .thumbnails import generate_thumbnails, has_thumbnails, remove_thumbnails
+from .models import User, Course, Group, Module, LectureMaterial, PracticalWork, PracticalWorkSubmission, Test, \
+    TestQuestion, QuestionOption, Schedule
+
+
+@receiver(pre_save, sender=PracticalWorkSubmission)
+def remember_old_values(sender, instance, update_fields=None, **kwargs):
+    instance._old_grade = instance._old_is_late = None
+    if instance.pk and (update_fields is None or {'grade', 'is_late'} & set(update_fields)):
+        instance._old_grade, instance._old_is_late = sender.objects.filter(pk=instance.pk) \
+            .values_list('grade', 'is_late').first() or (None, None)
+
+
+@receiver(post_save, sender=PracticalWorkSubmission)
+def update_grade_stats_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'grade' not in update_fields):
+        return
+    apply_grade_changes([(instance, getattr(instance, '_old_grade', None), instance.grade)])
+
+
+@receiver(post_save, sender=PracticalWorkSubmission)
+def update_submission_stats_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'is_late' not in update_fields):
+        return
+    apply_lateness_change(instance.practical_work_id, getattr(instance, '_old_is_late', None), instance.is_late)
+
+
+@receiver(post_delete, sender=PracticalWorkSubmission)
+def update_stats_on_delete(sender, instance, **kwargs):
+    apply_grade_changes([(instance, instance.grade, None)])
+    apply_lateness_change(instance.practical_work_id, instance.is_late, None)
+
+
+@receiver(post_delete, sender=PracticalWork)
+def refresh_grade_stats_on_practical_delete(sender, instance, **kwargs):
+    # Каскадне видалення робіт іде вже після самої практичної, тому курс перераховуємо після коміту
+    if instance.course_id is not None:
+        transaction.on_commit(partial(refresh_course_stats, [instance.course_id]))
+
+
+@receiver(m2m_changed, sender=Group.courses.through)
+def refresh_grade_stats_on_group_courses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        course_ids = [instance.pk]
+    elif action == 'pre_clear':
+        course_ids = list(instance.courses.values_list('id', flat=True))
+    else:
+        course_ids = list(pk_set)
+    transaction.on_commit(partial(refresh_course_stats, course_ids))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def refresh_grade_stats_on_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        groups = Group.objects.filter(pk=instance.pk)
+    elif action == 'pre_clear':
+        groups = instance.groups.all()
+    else:
+        groups = Group.objects.filter(pk__in=pk_set)
+    course_ids = list(groups.values_list('courses', flat=True).distinct())
+    transaction.on_commit(partial(refresh_course_stats, course_ids))
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    invalidate_course(instance.pk)
+    invalidate_schedule(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Module)
+@receiver([post_save, post_delete], sender=LectureMaterial)
+@receiver([post_save, post_delete], sender=PracticalWork)
+@receiver([post_save, post_delete], sender=Test)
+def invalidate_course_cache_on_content(sender, instance, **kwargs):
+    invalidate_course(instance.course_id)
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def invalidate_course_cache_on_teachers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_course(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_course(*instance.course_set.values_list('id', flat=True))
+    else:
+        invalidate_course(*pk_set)
+
+
+@receiver(pre_save, sender=User)
+def remember_new_profile_photo(sender, instance, **kwargs):
+    # Новий файл ще не збережений у сховище (його зберігає pre_save поля, вже після сигналу);
+    # прибрати фото - це порожнє поле при наявних варіантах
+    photo = instance.profile_photo
+    if photo:
+        instance._profile_photo_changed = not photo._committed
+    else:
+        instance._profile_photo_changed = instance.pk is not None and has_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def generate_thumbnails_on_photo_change(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_profile_photo_changed', False):
+        instance._profile_photo_changed = False
+        transaction.on_commit(lambda: enqueue(generate_thumbnails, instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def remove_thumbnails_on_user_delete(sender, instance, **kwargs):
+    remove_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_course_cache_on_teacher(sender, instance, update_fields=None, **kwargs):
+    # Картки на сторінці курсу є лише у викладачів, а вхід оновлює тільки last_login
+    if instance.role != 'teacher' or update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_course(*instance.course_set.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Test)
+def invalidate_answer_key_on_test(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=TestQuestion)
+def invalidate_answer_key_on_question(sender, instance, **kwargs):
+    invalidate_answer_key(instance.test_id)
+
+
+@receiver([post_save, post_delete], sender=QuestionOption)
+def invalidate_answer_key_on_option(sender, instance, **kwargs):
+    if instance.question_id is not None:
+        invalidate_answer_key(*TestQuestion.objects.filter(pk=instance.question_id).values_list('test_id', flat=True))
+
+
+@receiver(user_logged_out)
+def close_attendance_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        close_user_sessions(user.pk)
+
+
+@receiver(pre_save, sender=Schedule)
+def remember_old_schedule_course(sender, instance, **kwargs):
+    instance._old_course_id = None
+    if instance.pk:
+        instance._old_course_id = sender.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def invalidate_schedule_cache(sender, instance, **kwargs):
+    invalidate_schedule(instance.course_id, getattr(instance, '_old_course_id', None))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_cache_on_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user(instance.pk)
+    else:
+        # З боку групи чи права змінюється одразу багато користувачів
+        invalidate_all_users()
+
+
+@receiver(m2m_changed, sender=AuthGroup.permissions.through)
+def invalidate_user_cache_on_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_all_users()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_course_access_on_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_course_access(instance.pk)
+    else:
+        invalidate_all_course_access()
+
+
+@receiver(m2m_changed, sender=Group.courses.through)
+def invalidate_course_access_on_group_courses(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_all_course_access()
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def invalidate_course_access_on_teachers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        invalidate_course_access(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_course_access(*instance.teachers.values_list('id', flat=True))
+    else:
+        invalidate_course_access(*pk_set)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Course)
+def invalidate_course_access_on_delete(sender, instance, **kwargs):
+    invalidate_all_course_access()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_course_access_on_user_delete(sender, instance, **kwargs):
+    invalidate_course_access(instance.pk)
@@ -0,0 +1,157 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+
+READ_SIZE = 64 * 1024
+
+
+def stream_sha256(fh):
+    digest = hashlib.sha256()
+    for block in iter(lambda: fh.read(READ_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    with open(path, 'rb') as fh:
+        return stream_sha256(fh)
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    Файлове сховище з дедуплікацією за вмістом.
+
+    Вміст кожного файлу зберігається один раз у blobs/<sha[:2]>/<sha256>, а під звичайним
+    ім'ям FileField лежить жорстке посилання на нього. Лічильник посилань - це st_nlink
+    блоба, тому URL, path() та роздача файлів працюють як у FileSystemStorage, а
+    django_cleanup, видаляючи файл, прибирає лише посилання; сам блоб видаляється разом
+    з останнім посиланням.
+    """
+    blob_dir = 'blobs'
+
+    def blob_path(self, sha256):
+        return os.path.join(self.location, self.blob_dir, sha256[:2], sha256)
+
+    @contextlib.contextmanager
+    def blob_lock(self):
+        """
+        Монопольний flock на каталозі блобів. Посилання створюються і видаляються під ним,
+        тож st_nlink не змінюється між видаленням посилання і перевіркою лічильника.
+        """
+        root = os.path.join(self.location, self.blob_dir)
+        os.makedirs(root, exist_ok=True)
+        fd = os.open(root, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _store_blob(self, content):
+        """
+        Кладе вміст у сховище блобів і повертає шлях до блоба. Тимчасовий файл завантаження
+        переноситься перейменуванням, інший вміст пишеться блоками з підрахунком хешу.
+        """
+        os.makedirs(os.path.join(self.location, self.blob_dir), exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+            sha256 = file_sha256(source)
+            owned = False
+        else:
+            digest = hashlib.sha256()
+            fd, source = tempfile.mkstemp(dir=os.path.join(self.location, self.blob_dir), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    fh.write(chunk)
+            sha256 = digest.hexdigest()
+            owned = True
+
+        blob = self.blob_path(sha256)
+        if os.path.exists(blob):
+            if owned:
+                os.remove(source)
+            return blob
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            file_move_safe(source, blob)
+        except FileExistsError:
+            # Той самий вміст щойно зберіг інший процес
+            if owned:
+                os.remove(source)
+            return blob
+        if self.file_permissions_mode is not None:
+            os.chmod(blob, self.file_permissions_mode)
+        return blob
+
+    def _save(self, name, content):
+        blob = self._store_blob(content)
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                with self.blob_lock():
+                    os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            except FileNotFoundError:
+                # Блоб видалили разом з останнім посиланням між збереженням і link()
+                content.seek(0)
+                blob = self._store_blob(content)
+                continue
+            except OSError:
+                # Файлова система без жорстких посилань - зберігаємо звичайну копію
+                shutil.copyfile(blob, full_path)
+            break
+        return str(name).replace('\\', '/')
+
+    def delete(self, name):
+        """
+        Видаляє посилання name, а блоб - разом з останнім посиланням. Кількість посилань
+        перевіряється вже після видалення і під blob_lock, як і os.link у _save, тож
+        одночасні видалення кількох посилань не залишать блоб, на який ніщо не посилається.
+        """
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        path = self.path(name)
+        if os.path.isdir(path):
+            return super().delete(name)
+        try:
+            fh = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with fh:
+            with self.blob_lock():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    return
+                stat = os.fstat(fh.fileno())
+            # Лишився тільки блоб (у звичайної копії посилань не лишається зовсім)
+            if stat.st_nlink != 1:
+                return
+            # Хешуємо поза блокуванням: блоб перевіряється ще раз перед видаленням
+            self.release_blob(self.blob_path(stream_sha256(fh)), stat.st_ino)
+
+    def release_blob(self, blob, inode=None):
+        """
+        Видаляє блоб, якщо на нього не лишилось посилань (і це той самий inode, якщо задано).
+        """
+        with self.blob_lock():
+            try:
+                stat = os.stat(blob)
+            except FileNotFoundError:
+                return False
+            if stat.st_nlink != 1 or (inode is not None and stat.st_ino != inode):
+                return False
+            os.remove(blob)
+            return True
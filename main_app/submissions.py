@@ -0,0 +1,202 @@
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .db_writes import serialized_write
+from .jobs import enqueue, task
+from .models import Job, PracticalSubmissionStats, PracticalWorkSubmission, SubmissionReceipt
+from .uploads import store_file
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Пул збереження робіт і семафор на SUBMISSION_WORKERS + SUBMISSION_QUEUE_SIZE місць:
+    стільки квитанцій можуть одночасно оброблятися або чекати в черзі.
+    """
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.SUBMISSION_WORKERS,
+                                           thread_name_prefix='submissions')
+            _slots = threading.BoundedSemaphore(settings.SUBMISSION_WORKERS + settings.SUBMISSION_QUEUE_SIZE)
+        return _executor, _slots
+
+
+def arrival_time(request):
+    """
+    Час надходження запиту, записаний ArrivalTimeMiddleware до читання тіла і черг.
+    """
+    return getattr(request, 'arrived_at', None) or timezone.now()
+
+
+def staged_path(receipt):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f'{receipt.id}.receipt')
+
+
+def admit_submission(practical_work, student, uploaded_file, arrived_at):
+    """
+    Приймає роботу: копіює файл у проміжний каталог, створює квитанцію з часом надходження
+    і ставить збереження в пул. Повертає квитанцію одразу, статус студент опитує за її id.
+    """
+    graded = PracticalWorkSubmission.objects.filter(
+        practical_work=practical_work, student=student, grade__isnull=False).exists()
+    if graded:
+        raise ValueError('Graded submissions cannot be replaced.')
+    receipt = SubmissionReceipt(
+        practical_work=practical_work,
+        student=student,
+        filename=os.path.basename(uploaded_file.name)[:255],
+        arrived_at=arrived_at,
+        is_late=practical_work.is_late(arrived_at),
+    )
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    with open(staged_path(receipt), 'wb') as fh:
+        for chunk in uploaded_file.chunks():
+            fh.write(chunk)
+    try:
+        receipt.save(force_insert=True)
+    except Exception:
+        discard_staged(receipt)
+        raise
+    transaction.on_commit(lambda: dispatch(receipt.pk))
+    return receipt
+
+
+def dispatch(receipt_id):
+    """
+    Ставить квитанцію в пул. Якщо черга заповнена, запит зберігає роботу сам і відповідає
+    пізніше - так навантаження стримує клієнтів, а час надходження вже записаний.
+    Повертає False, якщо робота збережена в потоці запиту.
+    """
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        store_receipt(receipt_id)
+        return False
+
+    def run():
+        try:
+            store_receipt(receipt_id)
+        finally:
+            slots.release()
+            close_old_connections()
+
+    executor.submit(run)
+    return True
+
+
+def store_receipt(receipt_id):
+    """
+    Переносить файл квитанції в роботу студента. Час зміни роботи - час надходження, а не
+    збереження; квитанція, що прийшла раніше за вже збережену, файл не замінює. Файл
+    переноситься в сховище до serialized_write, під блокуванням оновлюються лише рядки БД.
+    """
+    stored = None
+    try:
+        receipt = SubmissionReceipt.objects.filter(pk=receipt_id, status=SubmissionReceipt.PENDING) \
+            .only('id', 'filename').first()
+        if receipt is None:
+            return None
+        stored = store_file(staged_path(receipt), receipt.filename)
+        with serialized_write(), transaction.atomic():
+            receipt = SubmissionReceipt.objects.select_for_update().select_related('practical_work') \
+                .filter(pk=receipt_id, status=SubmissionReceipt.PENDING).first()
+            if receipt is None:
+                return None
+            submission, created = PracticalWorkSubmission.objects.select_for_update().get_or_create(
+                practical_work_id=receipt.practical_work_id,
+                student_id=receipt.student_id,
+            )
+            if submission.grade is not None:
+                raise ValueError('Graded submissions cannot be replaced.')
+            replaced = not (submission.file and submission.submitted_at > receipt.arrived_at)
+            if replaced:
+                submission.file = stored
+                submission.submitted_at = receipt.arrived_at
+                submission.is_late = receipt.is_late
+                submission.save()
+            receipt.status = SubmissionReceipt.STORED
+            receipt.submission = submission
+            receipt.stored_at = timezone.now()
+            receipt.save(update_fields=['status', 'submission', 'stored_at'])
+        if replaced:
+            stored = None
+        return receipt
+    except Exception as e:
+        SubmissionReceipt.objects.filter(pk=receipt_id, status=SubmissionReceipt.PENDING) \
+            .update(status=SubmissionReceipt.FAILED, error=str(e) or type(e).__name__)
+        return None
+    finally:
+        # Файл, що не потрапив у роботу (пізніша вже збережена або помилка), не лишається в сховищі
+        if stored:
+            default_storage.delete(stored)
+        discard_staged(SubmissionReceipt(pk=receipt_id))
+
+
+@task(priority=20)
+def store_receipt_job(job, receipt_id):
+    return {'stored': store_receipt(receipt_id) is not None}
+
+
+def recover_receipts():
+    """
+    Ставить у чергу jobs збереження квитанцій, що чекають довше за SUBMISSION_RECOVERY_AGE
+    секунд: процес, який їх прийняв, завершився раніше, ніж пул їх зберіг. Квитанції, для яких
+    завдання вже в черзі, пропускаються. Повертає кількість поставлених завдань.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.SUBMISSION_RECOVERY_AGE)
+    pending = {str(receipt_id) for receipt_id in SubmissionReceipt.objects.filter(
+        status=SubmissionReceipt.PENDING, arrived_at__lt=cutoff).values_list('id', flat=True)}
+    if not pending:
+        return 0
+    queued = Job.objects.filter(task=store_receipt_job.task_name, status__in=[Job.QUEUED, Job.RUNNING]) \
+        .values_list('args', flat=True)
+    pending -= {args[0] for args in queued}
+    with serialized_write():
+        for receipt_id in sorted(pending):
+            enqueue(store_receipt_job, receipt_id)
+    return len(pending)
+
+
+def discard_staged(receipt):
+    try:
+        os.remove(staged_path(receipt))
+    except FileNotFoundError:
+        pass
+
+
+def count_submissions(practical_work_id):
+    return PracticalWorkSubmission.objects.filter(practical_work_id=practical_work_id).aggregate(
+        on_time=Count('id', filter=Q(is_late=False)),
+        late=Count('id', filter=Q(is_late=True)),
+    )
+
+
+def apply_lateness_change(practical_work_id, old_is_late, new_is_late):
+    """
+    Оновлює лічильник практичної приростом: None - роботи з файлом немає, True/False -
+    здана із запізненням чи вчасно. Викликати після запису зміни в practical_work_submissions.
+    """
+    if practical_work_id is None or old_is_late == new_is_late:
+        return
+    delta = {'on_time': 0, 'late': 0}
+    if old_is_late is not None:
+        delta['late' if old_is_late else 'on_time'] -= 1
+    if new_is_late is not None:
+        delta['late' if new_is_late else 'on_time'] += 1
+    rows = PracticalSubmissionStats.objects.filter(practical_work_id=practical_work_id)
+    if not rows.update(on_time=F('on_time') + delta['on_time'], late=F('late') + delta['late']):
+        # Рядка ще немає - рахуємо його з робіт, які вже містять цю зміну
+        PracticalSubmissionStats.objects.get_or_create(
+            practical_work_id=practical_work_id, defaults=count_submissions(practical_work_id))
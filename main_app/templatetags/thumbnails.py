@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from main_app.thumbnails import thumbnail_urls
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def profile_photo(user, size, css_class='', alt=None):
+    """
+    Фото профілю у варіанті, що відповідає розміру size (CSS-пікселі) на сторінці:
+    WebP для браузерів, що його підтримують, і JPEG для решти. Поки варіанти не
+    згенеровані, показується оригінал, а без фото - зображення за замовчуванням.
+    Без alt підписом стає ім'я користувача (у анонімного - порожній).
+
+        {% load thumbnails %}
+        {% profile_photo teacher 100 'teacher-photo' %}
+    """
+    # У анонімного користувача фото немає
+    photo = getattr(user, 'profile_photo', None)
+    if alt is None:
+        alt = ' '.join(filter(None, (getattr(user, 'first_name', ''), getattr(user, 'last_name', ''))))
+    urls = thumbnail_urls(photo, size) if photo else None
+    if urls is None:
+        src = photo.url if photo else static('img/default_profile.png')
+        return format_html('<img src="{}" width="{}" height="{}" alt="{}" class="{}">',
+                           src, size, size, alt, css_class)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        urls['webp'], urls['jpeg'], size, size, alt, css_class,
+    )
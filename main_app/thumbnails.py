@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shutil
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .course_cache import invalidate_course
+from .jobs import task
+from .models import Course, User
+
+
+# Розширення файлу та параметри Pillow для кожного формату варіантів
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 6}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_dir(user_id):
+    return f'{settings.THUMBNAIL_DIR}/{user_id}'
+
+
+def source_version(photo):
+    """
+    Версія вихідного фото - його mtime. django_cleanup звільняє ім'я старого фото, тож нове
+    може отримати те саме ім'я, а версія в імені варіанта не дасть віддати застарілий кеш.
+    """
+    try:
+        return os.stat(photo.path).st_mtime_ns
+    except (FileNotFoundError, NotImplementedError, ValueError):
+        return None
+
+
+def thumbnail_name(user_id, photo_name, version, size, fmt):
+    key = hashlib.sha256(f'{photo_name}:{version}:{size}'.encode()).hexdigest()[:32]
+    return f'{thumbnail_dir(user_id)}/{key}.{THUMBNAIL_FORMATS[fmt][0]}'
+
+
+def pick_size(display_size):
+    """
+    Найменший варіант, не менший за подвійний розмір на сторінці (екрани з високою щільністю).
+    """
+    sizes = sorted(settings.THUMBNAIL_SIZES)
+    return next((size for size in sizes if size >= display_size * 2), sizes[-1])
+
+
+def thumbnail_urls(photo, display_size):
+    """
+    URL варіантів фото {формат: url} для показу в display_size пікселів або None, якщо
+    варіанти ще не згенеровані (тоді показується оригінал).
+    """
+    version = source_version(photo)
+    if version is None:
+        return None
+    size = pick_size(display_size)
+    names = {fmt: thumbnail_name(photo.instance.pk, photo.name, version, size, fmt) for fmt in THUMBNAIL_FORMATS}
+    if not all(os.path.exists(default_storage.path(name)) for name in names.values()):
+        return None
+    return {fmt: default_storage.url(name) for fmt, name in names.items()}
+
+
+def _write_atomic(path, image, options):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        image.save(fh, **options)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnails(user):
+    """
+    Квадратні варіанти фото профілю у всіх THUMBNAIL_SIZES і форматах. Старі варіанти
+    користувача видаляються, тож у каталозі лишаються лише файли поточного фото.
+    """
+    directory = default_storage.path(thumbnail_dir(user.pk))
+    photo = user.profile_photo
+    version = source_version(photo) if photo else None
+    if version is None:
+        shutil.rmtree(directory, ignore_errors=True)
+        return []
+
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    with Image.open(photo.path) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+        for size in sorted(settings.THUMBNAIL_SIZES, reverse=True):
+            # Кожен розмір зменшується з попереднього: так швидше, ніж щоразу з оригіналу
+            image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            for fmt, (ext, options) in THUMBNAIL_FORMATS.items():
+                name = thumbnail_name(user.pk, photo.name, version, size, fmt)
+                _write_atomic(default_storage.path(name), image, options)
+                names.append(name)
+
+    keep = {os.path.basename(name) for name in names}
+    for filename in os.listdir(directory):
+        if filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+    return names
+
+
+@task(priority=5)
+def generate_thumbnails(job, user_id):
+    user = User.objects.filter(pk=user_id).only('id', 'profile_photo').first()
+    if user is None:
+        return {'thumbnails': []}
+    names = render_thumbnails(user)
+    # Картки викладачів у кеші сторінки курсу зібрані ще з оригінальним фото
+    invalidate_course(*Course.teachers.through.objects.filter(user_id=user_id).values_list('course_id', flat=True))
+    return {'thumbnails': names}
+
+
+def has_thumbnails(user_id):
+    return os.path.isdir(default_storage.path(thumbnail_dir(user_id)))
+
+
+def remove_thumbnails(user_id):
+    shutil.rmtree(default_storage.path(thumbnail_dir(user_id)), ignore_errors=True)
@@ -0,0 +1,163 @@
+import datetime
+import fcntl
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .db_writes import serialized_write
+from .models import PracticalWorkSubmission, UploadSession
+
+
+READ_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset):
+        super().__init__(f'Expected offset {offset}')
+        self.offset = offset
+
+
+class AssembledFile(File):
+    """
+    Зібраний на диску файл. FileSystemStorage бачить temporary_file_path і переносить
+    його в MEDIA_ROOT перейменуванням, не читаючи вміст.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(session):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f'{session.id}.part')
+
+
+def create_session(practical_work, student, filename, size):
+    if size <= 0 or size > settings.UPLOAD_MAX_SIZE:
+        raise ValueError(f'File size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes')
+    session = UploadSession.objects.create(
+        practical_work=practical_work,
+        student=student,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+    )
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def append_chunk(session, offset, stream, length, checksum=None, arrived_at=None):
+    """
+    Дописує частину файлу з потоку запиту, починаючи з offset. arrived_at - час надходження
+    запиту з цією частиною (див. submission_arrival).
+
+    Частина пишеться з диска на диск блоками по READ_SIZE, а при невдачі файл обрізається
+    назад до offset, тож клієнт може просто повторити ту саму частину. Читання запиту і
+    запис на диск ідуть поза serialized_write: повільний клієнт тримає лише flock на файлі
+    своєї сесії, а черга записів БД чекає тільки на оновлення offset. Після останньої
+    частини файл прикріплюється до роботи студента (ще під flock сесії) і повертається
+    PracticalWorkSubmission.
+    """
+    if length <= 0 or length > settings.UPLOAD_CHUNK_SIZE:
+        raise ValueError(f'Chunk size must be between 1 and {settings.UPLOAD_CHUNK_SIZE} bytes')
+
+    with open(part_path(session), 'r+b') as fh:
+        # Повтор тієї ж частини з іншого запиту чекає тут, поки перший не оновить offset
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        session = UploadSession.objects.select_related('practical_work').get(pk=session.pk)
+        if offset != session.offset:
+            raise UploadOffsetMismatch(session.offset)
+        if offset + length > session.size:
+            raise ValueError('Chunk exceeds the declared file size')
+
+        digest = hashlib.sha256()
+        fh.seek(offset)
+        fh.truncate()
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            fh.write(data)
+            digest.update(data)
+            remaining -= len(data)
+        if remaining or (checksum and digest.hexdigest() != checksum.lower()):
+            fh.seek(offset)
+            fh.truncate()
+            raise ValueError('Chunk is incomplete or its checksum does not match')
+        fh.flush()
+        os.fsync(fh.fileno())
+
+        if offset + length == session.size:
+            # Offset останньої частини не зберігається: якщо finish_session впаде, сесія
+            # лишиться на цьому offset, і повтор частини знову спробує завершити завантаження
+            return finish_session(session, arrived_at or timezone.now())
+
+        with serialized_write():
+            advanced = UploadSession.objects.filter(pk=session.pk, offset=offset) \
+                .update(offset=offset + length, updated_at=timezone.now())
+        if not advanced:
+            raise UploadOffsetMismatch(session.offset)
+    return None
+
+
+def submission_arrival(session, arrived_at):
+    """
+    Час надходження порційно завантаженої роботи - надходження останньої частини. Якщо
+    завантаження почалось до дедлайну і завершилось не пізніше UPLOAD_DEADLINE_GRACE секунд
+    після нього, зараховується час початку: повільне з'єднання не робить роботу запізнілою,
+    але сесія, відкрита заздалегідь, не продовжує дедлайн.
+    """
+    deadline = session.practical_work.deadline
+    if deadline is None or arrived_at <= deadline:
+        return arrived_at
+    grace_end = deadline + datetime.timedelta(seconds=settings.UPLOAD_DEADLINE_GRACE)
+    if session.created_at <= deadline and arrived_at <= grace_end:
+        return session.created_at
+    return arrived_at
+
+
+def finish_session(session, arrived_at):
+    """
+    Прикріплює зібраний файл до роботи з часом надходження за submission_arrival.
+    """
+    arrived_at = submission_arrival(session, arrived_at)
+    name = store_file(part_path(session), session.filename)
+    try:
+        with serialized_write(), transaction.atomic():
+            submission, created = PracticalWorkSubmission.objects.get_or_create(
+                practical_work_id=session.practical_work_id,
+                student_id=session.student_id,
+            )
+            submission.file = name
+            submission.submitted_at = arrived_at
+            submission.is_late = session.practical_work.is_late(arrived_at)
+            submission.save()
+            discard_session(session)
+    except Exception:
+        default_storage.delete(name)
+        raise
+    return submission
+
+
+def store_file(path, filename):
+    """
+    Переносить зібраний файл у сховище робіт студентів і повертає його ім'я. Викликається
+    до serialized_write: між файловими системами перенесення - це копіювання, а під
+    блокуванням мають лишатися тільки рядки БД.
+    """
+    field = PracticalWorkSubmission._meta.get_field('file')
+    with open(path, 'rb') as fh:
+        return field.storage.save(field.generate_filename(None, filename), AssembledFile(fh, name=filename))
+
+
+def discard_session(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
@@ -19,8 +19,10 @@ urlpatterns = [
     path('course/<int:course_id>/check_practicals/', views.check_practicals, name='check_practicals'),
     path('course/<int:course_id>/check_practicals/<int:practical_id>/', views.check_practical_details,
          name='check_practical_details'),
+    path('course/<int:course_id>/gradebook/', views.gradebook_export, name='gradebook_export'),
     path('submit_practical_work/<int:work_id>/', views.submit_practical_work, name='submit_practical_work'),
     path('tests/', views.tests, name='tests'),
+    path('tests/<int:test_id>/', views.take_test, name='take_test'),
     path('profile/', views.profile_view, name='profile'),
     path('users/', views.UserListView.as_view(), name='user-list'),
     path('users/<int:pk>/', views.UserDetailView.as_view(), name='user-detail'),
@@ -29,6 +31,20 @@ urlpatterns = [
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('protected/', ProtectedView.as_view(), name='protected'),
+    path('api/practicals/<int:practical_id>/grades/', views.BulkGradeView.as_view(), name='bulk_grade'),
+    path('api/tests/<int:test_id>/attempts/', views.TestAttemptsView.as_view(), name='test_attempts'),
+    path('api/calendar/', views.CalendarView.as_view(), name='calendar'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('api/attendance/', views.AttendanceReportView.as_view(), name='attendance_report'),
+    path('api/practicals/<int:work_id>/uploads/', views.UploadSessionCreateView.as_view(), name='upload_session_create'),
+    path('api/uploads/<uuid:session_id>/', views.UploadSessionView.as_view(), name='upload_session'),
+    path('api/submissions/receipts/<uuid:receipt_id>/', views.SubmissionReceiptView.as_view(), name='submission_receipt'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('api/jobs/stats/', views.JobStatsView.as_view(), name='job_stats'),
+    path('api/jobs/<int:job_id>/', views.JobView.as_view(), name='job'),
     path('api/', include(router.urls)),
     path('analytics/', views.analytics, name='analytics'),
+    path('api/analytics/', views.analytics_data, name='analytics_data'),
+    path('charts/<str:key>.png', views.chart, name='chart'),
 ]
@@ -1,53 +1,113 @@
 from django.utils import timezone
-from django.db.models import Avg, Count
-from django.utils.safestring import mark_safe
+from django.db.models import Avg, Count, Prefetch, Q
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from django.views.decorators.http import condition
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from rest_framework import generics, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, SAFE_METHODS
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from .models import User, Course, Test, Group, PracticalWork, PracticalWorkSubmission, Grade
-from .serializers import UserSerializer, CourseSerializer, TestSerializer
+from .models import User, Course, Test, TestQuestion, QuestionOption, Group, PracticalWork, PracticalWorkSubmission, \
+    Grade, UploadSession, SubmissionReceipt, Job
+from .serializers import UserSerializer, CourseSerializer, TestSerializer, GradebookSerializer, \
+    TestAttemptsSerializer, UploadSessionSerializer, SubmissionReceiptSerializer, JobSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import authenticate, logout, login as auth_login
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
 from django.conf import settings
 from rest_framework import serializers
 from .forms import ProfileForm, PracticalWorkSubmissionForm, CourseForm, ModuleFormSet, PracticalWorkFormSet, \
     LectureMaterialFormSet
-import matplotlib.pyplot as plt
-import io
-import urllib, base64
-
-def home(request):
-    courses = Course.objects.all()
+from .access import acan_teach, acan_view, ateachable_course_ids, can_teach, can_view, teachable_course_ids, \
+    viewable_course_ids
+from .aio import alist
+from .analytics import acourse_statistics, course_statistics
+from .attendance import BUCKETS as ATTENDANCE_BUCKETS, attendance_report
+from .autograde import answers_from_post, get_answer_key, grade_attempts
+from .charts import chart_exists, chart_url, get_chart_path
+from .course_cache import aget_course_fragments
+from .gradebook import export_gradebook_xlsx, gradebook_csv, gradebook_rows
+from .jobs import enqueue, job_results_dir, queue_stats
+from .grading import bulk_grade, grades_from_post, submissions_by_group, validate_grades
+from .media import accel_redirect_response, can_access_media, file_etag, file_response
+from .permissions import CourseAccessPermission
+from .submissions import admit_submission, arrival_time
+from .scheduling import calendar_bound, calendar_etag, calendar_ics, course_events, feed_token, schedule_versions, \
+    user_from_feed_token
+from .uploads import UploadOffsetMismatch, append_chunk, create_session, discard_session
+import asyncio
+import importlib.util
+import os
+
+async def arequest_user(request):
+    """
+    Користувач для async-представлень. request.user підміняється завантаженим об'єктом, щоб
+    шаблони (контекстний процесор auth) не робили синхронний запит до бази в циклі подій.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+async def home(request):
+    courses, _ = await asyncio.gather(alist(Course.objects.all()), arequest_user(request))
     return render(request, 'home.html', {'courses': courses})
 
 
-def course_detail(request, course_id):
-    course = get_object_or_404(Course, pk=course_id)
-    user_has_access = request.user.groups.filter(courses=course).exists()
-    return render(request, 'course_detail.html', {'course': course, 'user_has_access': user_has_access})
+async def course_detail(request, course_id):
+    user = await arequest_user(request)
+    fragments, is_teacher = await asyncio.gather(aget_course_fragments(course_id), acan_teach(user, course_id))
+    if fragments is None:
+        raise Http404
+    return render(request, 'course_detail.html', {
+        'course_id': course_id,
+        'fragments': fragments,
+        # Матеріали замість публічної сторінки бачать студенти курсу, викладачам лишаються кнопки керування
+        'user_has_access': not is_teacher and await acan_view(user, course_id),
+        'is_teacher': is_teacher,
+    })
 
 
 @login_required
 def submit_practical_work(request, work_id):
-    practical_work = get_object_or_404(PracticalWork, pk=work_id)
+    practical_work = get_object_or_404(PracticalWork.objects.select_related('course'), pk=work_id)
     course = practical_work.course
+    if not can_view(request.user, course.id):
+        raise Http404
     submission, created = PracticalWorkSubmission.objects.get_or_create(
         practical_work=practical_work,
         student=request.user,
     )
 
     if request.method == 'POST':
+        # Час надходження береться з моменту входу запиту, а не збереження файлу
+        arrived_at = arrival_time(request)
         form = PracticalWorkSubmissionForm(request.POST, request.FILES, instance=submission)
         if form.is_valid():
-            form.save()
-            return redirect('course_detail', course_id=course.id)
+            uploaded_file = request.FILES.get('file')
+            if uploaded_file is None:
+                form.add_error('file', 'Оберіть файл')
+            else:
+                try:
+                    receipt = admit_submission(practical_work, request.user, uploaded_file, arrived_at)
+                except ValueError as e:
+                    form.add_error('file', str(e))
+                else:
+                    arrived = timezone.localtime(receipt.arrived_at).strftime('%d.%m.%Y %H:%M:%S')
+                    status = 'із запізненням' if receipt.is_late else 'вчасно'
+                    messages.success(request, f'Роботу прийнято {arrived} ({status}). Квитанція: {receipt.id}')
+                    return redirect('submit_practical_work', work_id=practical_work.id)
     else:
         form = PracticalWorkSubmissionForm(instance=submission)
 
@@ -56,22 +116,24 @@ def submit_practical_work(request, work_id):
         'practical_work': practical_work,
         'form': form,
         'submission': submission,
+        'receipt': SubmissionReceipt.objects.filter(practical_work=practical_work, student=request.user)
+        .order_by('-arrived_at').first(),
+        'upload_chunk_size': settings.UPLOAD_CHUNK_SIZE,
     })
 
 
-@login_required
-def courses(request):
-    user = request.user
-    user_groups = user.groups.all()
+async def courses(request):
+    user = await arequest_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
 
+    user_groups, courses = [], []
     if user.role == 'student':
-        # Показати курси для студентів
-        courses = Course.objects.filter(groups__in=user_groups).distinct()
+        # Показати курси для студентів: шаблон виводить їх по групах
+        user_groups = await alist(user.groups.prefetch_related('courses'))
     elif user.role == 'teacher':
         # Показати курси для викладачів
-        courses = Course.objects.filter(teachers=user).distinct()
-    else:
-        courses = []
+        courses = await alist(Course.objects.filter(id__in=await ateachable_course_ids(user)))
 
     return render(request, 'courses.html', {'courses': courses, 'user_groups': user_groups, 'user_role': user.role})
 
@@ -95,6 +157,8 @@ def create_course(request):
 @login_required
 def edit_course(request, course_id):
     course = get_object_or_404(Course, id=course_id)
+    if not can_teach(request.user, course_id):
+        return redirect('course_detail', course_id=course_id)
     if request.method == 'POST':
         course_form = CourseForm(request.POST, instance=course)
         module_formset = ModuleFormSet(request.POST, instance=course)
@@ -126,7 +190,9 @@ def edit_course(request, course_id):
 @login_required
 def check_practicals(request, course_id):
     course = get_object_or_404(Course, id=course_id)
-    practical_works = PracticalWork.objects.filter(course=course)
+    if not can_teach(request.user, course_id):
+        return redirect('course_detail', course_id=course_id)
+    practical_works = PracticalWork.objects.filter(course=course).select_related('submission_stats')
 
     return render(request, 'check_practicals.html', {
         'course': course,
@@ -137,44 +203,179 @@ def check_practicals(request, course_id):
 @login_required
 def check_practical_details(request, course_id, practical_id):
     course = get_object_or_404(Course, id=course_id)
-    practical_work = get_object_or_404(PracticalWork, id=practical_id)
-    submissions = PracticalWorkSubmission.objects.filter(practical_work=practical_work)
+    practical_work = get_object_or_404(PracticalWork, id=practical_id, course=course)
+    if not can_teach(request.user, course_id):
+        return redirect('course_detail', course_id=course_id)
 
     if request.method == 'POST':
-        for submission in submissions:
-            grade = request.POST.get(f'grade_{submission.id}')
-            if grade:
-                submission.grade = grade
-                submission.grade_date = timezone.now()
-                submission.teacher = request.user
-            else:
-                submission.grade = None
-                submission.grade_date = None
-                submission.teacher = None
-            submission.save()
+        try:
+            grades = grades_from_post(request.POST)
+            validate_grades(practical_work, grades)
+        except ValueError:
+            messages.error(request, f'Оцінка має бути цілим числом від 0 до {practical_work.max_score:g}')
+        else:
+            updated = bulk_grade(practical_work, grades, request.user)
+            messages.success(request, f'Оновлено оцінок: {updated}')
         return redirect('check_practical_details', course_id=course_id, practical_id=practical_id)
 
-    groups = course.groups.all()
-    submissions_by_group = {}
-    for group in groups:
-        group_submissions = submissions.filter(student__groups=group)
-        submissions_by_group[group.name] = group_submissions
+    pages = {}
+    for key, value in request.GET.items():
+        group_id = key[len('page_'):]
+        if key.startswith('page_') and is_ascii_digits(group_id) and is_ascii_digits(value):
+            pages[int(group_id)] = max(1, int(value))
+    group_blocks = submissions_by_group(course, practical_work, pages, settings.REVIEW_SUBMISSIONS_PER_PAGE)
 
     return render(request, 'check_practical_details.html', {
         'course': course,
         'practical_work': practical_work,
-        'submissions_by_group': submissions_by_group,
+        'group_blocks': group_blocks,
     })
 
 
+@login_required
+def gradebook_export(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+    if not can_teach(request.user, course_id):
+        return redirect('course_detail', course_id=course_id)
+
+    if request.GET.get('format') == 'xlsx':
+        # XLSX збирається цілком у пам'яті, тож будується фоновим завданням, а не в запиті
+        if importlib.util.find_spec('openpyxl') is None:
+            return HttpResponse('XLSX export requires openpyxl', status=501)
+        job = enqueue(export_gradebook_xlsx, course.id, user=request.user)
+        return redirect('job_detail', job_id=job.id)
+
+    response = StreamingHttpResponse(gradebook_csv(gradebook_rows(course)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="gradebook_{course.id}.csv"'
+    return response
+
+
+def get_user_job(request, job_id):
+    if request.user.is_staff:
+        return get_object_or_404(Job, pk=job_id)
+    return get_object_or_404(Job, pk=job_id, user=request.user)
+
+
+def job_download_url(job):
+    if job.status == Job.SUCCEEDED and isinstance(job.result, dict) and job.result.get('file'):
+        return reverse('job_download', args=[job.id])
+    return None
+
+
+@login_required
+def job_detail(request, job_id):
+    job = get_user_job(request, job_id)
+    return render(request, 'job_detail.html', {'job': job, 'download_url': job_download_url(job)})
+
+
+@login_required
+def job_download(request, job_id):
+    job = get_user_job(request, job_id)
+    if job_download_url(job) is None:
+        raise Http404
+    filename = os.path.basename(job.result['file'])
+    path = os.path.join(job_results_dir(job), filename)
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+
+
+@login_required
 def tests(request):
-    return render(request, 'tests.html')
+    user = request.user
+    course_ids = teachable_course_ids(user) if user.role == 'teacher' else viewable_course_ids(user)
+    course_tests = Test.objects.filter(course_id__in=course_ids).select_related('course') \
+        .order_by('course__title', 'title')
+    scores = dict(Grade.objects.filter(student=user, test__in=course_tests).values_list('test_id', 'score'))
+    return render(request, 'tests.html', {
+        'tests': [(test, scores.get(test.id)) for test in course_tests],
+        'max_score': settings.TEST_MAX_SCORE,
+    })
+
+
+@login_required
+def take_test(request, test_id):
+    test = get_object_or_404(Test.objects.select_related('course'), pk=test_id)
+    if not can_view(request.user, test.course_id):
+        raise Http404
 
+    if request.method == 'POST':
+        answers = answers_from_post(request.POST, get_answer_key(test.id))
+        score = grade_attempts(test, {request.user.pk: answers})[request.user.pk]
+        messages.success(request, f'Тест оцінено: {score} з {settings.TEST_MAX_SCORE}.')
+        return redirect('take_test', test_id=test.id)
+
+    questions = TestQuestion.objects.filter(test=test).prefetch_related(
+        Prefetch('questionoption_set', queryset=QuestionOption.objects.order_by('id').only('id', 'question_id', 'content')),
+    ).order_by('id')
+    grade = Grade.objects.filter(test=test, student=request.user).order_by('id').first()
+    return render(request, 'take_test.html', {
+        'test': test,
+        'questions': questions,
+        'grade': grade,
+        'max_score': settings.TEST_MAX_SCORE,
+    })
 
-class UserListView(generics.ListCreateAPIView):
+
+def is_ascii_digits(value):
+    # Сам isdigit() пропускає й не-ASCII цифри на кшталт '²', які int() не розбирає
+    return value.isascii() and value.isdigit()
+
+
+def int_query_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if not is_ascii_digits(value):
+        raise ValidationError({name: 'Must be an integer id.'})
+    return int(value)
+
+
+class SparseQuerysetMixin:
+    """
+    Для GET-запитів вибирає з БД лише ті колонки, які віддає серіалізатор (з урахуванням ?fields=),
+    а M2M-поля підтягує одним prefetch-запитом на сторінку.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        model_fields = {field.name: field for field in queryset.model._meta.get_fields()}
+        columns = {'pk'}
+        prefetches = []
+        for serializer_field in self.get_serializer().fields.values():
+            if serializer_field.write_only:
+                continue
+            model_field = model_fields.get(serializer_field.source)
+            if model_field is None:
+                continue
+            if model_field.many_to_many and not model_field.auto_created:
+                related_model = model_field.related_model
+                prefetches.append(Prefetch(model_field.name, queryset=related_model.objects.only('pk')))
+            elif model_field.concrete:
+                columns.add(model_field.name)
+        return queryset.only(*columns).prefetch_related(*prefetches)
+
+
+class UserListView(SparseQuerysetMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        role = self.request.query_params.get('role')
+        if role:
+            queryset = queryset.filter(role=role)
+        group_id = int_query_param(self.request, 'group')
+        if group_id is not None:
+            queryset = queryset.filter(groups=group_id)
+        course_id = int_query_param(self.request, 'course')
+        if course_id is not None:
+            queryset = queryset.filter(Q(groups__courses=course_id) | Q(course=course_id)).distinct()
+        return queryset
+
 
 class UserDetailView(generics.RetrieveAPIView):
     queryset = User.objects.all()
@@ -192,18 +393,247 @@ class UserUpdateView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     authentication_classes = [JWTAuthentication]
-    permission_classes = [IsAuthenticated]
-
-class TestViewSet(viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, CourseAccessPermission]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        teacher_id = int_query_param(self.request, 'teacher')
+        if teacher_id is not None:
+            queryset = queryset.filter(teachers=teacher_id)
+        group_id = int_query_param(self.request, 'group')
+        if group_id is not None:
+            queryset = queryset.filter(groups=group_id)
+        return queryset
+
+class TestViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Test.objects.all()
     serializer_class = TestSerializer
     authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, CourseAccessPermission]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(course_id__in=viewable_course_ids(self.request.user))
+        course_id = int_query_param(self.request, 'course')
+        if course_id is not None:
+            queryset = queryset.filter(course=course_id)
+        return queryset
+
+    def perform_create(self, serializer):
+        if not can_teach(self.request.user, serializer.validated_data['course'].pk):
+            raise PermissionDenied('Only course teachers can add tests.')
+        serializer.save()
+
+    def perform_update(self, serializer):
+        course = serializer.validated_data.get('course')
+        if course is not None and not can_teach(self.request.user, course.pk):
+            raise PermissionDenied('Only course teachers can move tests to this course.')
+        serializer.save()
+
+
+
+class BulkGradeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, practical_id):
+        practical_work = get_object_or_404(PracticalWork, id=practical_id)
+        if not can_teach(request.user, practical_work.course_id):
+            return Response({'detail': 'Only course teachers can grade submissions.'}, status=403)
+        serializer = GradebookSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            updated = bulk_grade(practical_work, serializer.validated_data['grades'], request.user)
+        except ValueError as e:
+            raise ValidationError({'grades': str(e)})
+        return Response({'updated': updated})
+
+
+class TestAttemptsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, test_id):
+        test = get_object_or_404(Test, pk=test_id)
+        if not can_teach(request.user, test.course_id):
+            return Response({'detail': 'Only course teachers can submit test attempts.'}, status=403)
+        serializer = TestAttemptsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attempts = serializer.validated_data['attempts']
+        enrolled = set(User.objects.filter(pk__in=attempts.keys(), groups__courses=test.course_id)
+                       .values_list('id', flat=True))
+        unknown = sorted(set(attempts) - enrolled)
+        if unknown:
+            raise ValidationError({'attempts': f'Students {unknown} are not enrolled in the course.'})
+        return Response({'scores': grade_attempts(test, attempts)})
+
+
+class AttendanceReportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        course_id = int_query_param(request, 'course')
+        if course_id is None:
+            raise ValidationError({'course': 'This parameter is required.'})
+        bucket = request.query_params.get('bucket', 'week')
+        if bucket not in ATTENDANCE_BUCKETS:
+            raise ValidationError({'bucket': f'Must be one of {", ".join(ATTENDANCE_BUCKETS)}.'})
+        dates = {}
+        for name in ('from', 'to'):
+            value = request.query_params.get(name)
+            try:
+                # parse_date повертає None для іншого формату і кидає ValueError для неіснуючої дати
+                dates[name] = parse_date(value) if value else None
+            except ValueError:
+                dates[name] = None
+            if value and dates[name] is None:
+                raise ValidationError({name: 'Must be a date in YYYY-MM-DD format.'})
+
+        user_id = int_query_param(request, 'user')
+        if not can_teach(request.user, course_id):
+            # Студент бачить лише власну відвідуваність
+            if user_id not in (None, request.user.pk):
+                return Response({'detail': 'You can only view your own attendance.'}, status=403)
+            user_id = request.user.pk
+
+        return Response(attendance_report(course_id, user_id, dates['from'], dates['to'], bucket))
+
+
+class CalendarView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        bounds = {}
+        for name in ('from', 'to'):
+            value = request.query_params.get(name)
+            try:
+                bounds[name] = calendar_bound(value, upper=name == 'to') if value else None
+            except ValueError:
+                raise ValidationError({name: 'Must be an ISO date or datetime.'})
+
+        course_ids = viewable_course_ids(request.user)
+        versions = schedule_versions(course_ids)
+        etag = calendar_etag(course_ids, versions, f'json:{bounds["from"]}:{bounds["to"]}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            events = [
+                event
+                for course in course_events(course_ids, versions).values()
+                for event in course['events']
+                if (bounds['from'] is None or event['end'] > bounds['from'])
+                and (bounds['to'] is None or event['start'] < bounds['to'])
+            ]
+            events.sort(key=lambda event: (event['start'], event['id']))
+            response = Response({
+                'feed_url': request.build_absolute_uri(reverse('calendar_feed', args=[feed_token(request.user)])),
+                'events': events,
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def calendar_feed(request, token):
+    user = user_from_feed_token(token)
+    if user is None:
+        raise Http404
+    course_ids = viewable_course_ids(user)
+    versions = schedule_versions(course_ids)
+    etag = calendar_etag(course_ids, versions, 'ics')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(calendar_ics(course_events(course_ids, versions)),
+                                content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class UploadSessionCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, work_id):
+        practical_work = get_object_or_404(PracticalWork, pk=work_id)
+        if not can_view(request.user, practical_work.course_id):
+            raise Http404
+        submission = PracticalWorkSubmission.objects.filter(practical_work=practical_work, student=request.user).first()
+        if submission is not None and submission.grade is not None:
+            return Response({'detail': 'Graded submissions cannot be replaced.'}, status=403)
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = create_session(practical_work, request.user, serializer.validated_data['filename'],
+                                     serializer.validated_data['size'])
+        except ValueError as e:
+            raise ValidationError({'size': str(e)})
+        data = UploadSessionSerializer(session).data
+        data['chunk_size'] = settings.UPLOAD_CHUNK_SIZE
+        return Response(data, status=201)
+
+
+class UploadSessionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, session_id):
+        return get_object_or_404(UploadSession, pk=session_id, student=request.user)
+
+    def get(self, request, session_id):
+        return Response(UploadSessionSerializer(self.get_session(request, session_id)).data)
+
+    def put(self, request, session_id):
+        session = self.get_session(request, session_id)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            raise ValidationError('Upload-Offset and Content-Length headers are required.')
+        try:
+            submission = append_chunk(session, offset, request.stream, length,
+                                      checksum=request.headers.get('X-Chunk-SHA256'),
+                                      arrived_at=arrival_time(request))
+        except UploadOffsetMismatch as e:
+            return Response({'detail': str(e), 'offset': e.offset}, status=409)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        if submission is not None:
+            return Response({'offset': session.size, 'completed': True, 'file': submission.file.url})
+        return Response({'offset': offset + length, 'completed': False})
+
+    def delete(self, request, session_id):
+        discard_session(self.get_session(request, session_id))
+        return Response(status=204)
+
+
+class SubmissionReceiptView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request, receipt_id):
+        receipt = get_object_or_404(SubmissionReceipt, pk=receipt_id, student=request.user)
+        return Response(SubmissionReceiptSerializer(receipt).data)
+
+
+class JobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_user_job(request, job_id)
+        data = JobSerializer(job).data
+        data['download'] = job_download_url(job)
+        return Response(data)
+
+
+class JobStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            minutes = int(request.query_params.get('minutes', 60))
+        except ValueError:
+            raise ValidationError({'minutes': 'Must be an integer.'})
+        return Response(queue_stats(minutes))
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -271,78 +701,94 @@ def logout_view(request):
     return redirect('login')
 
 
-def generate_plot(data, title):
-    plt.figure(figsize=(10, 6))
-    for label, values in data.items():
-        if values['value'] is not None:  # Додано перевірку на None
-            plt.bar(label, values['value'], label=values['label'])
-    plt.title(title)
-    plt.ylabel('Середня оцінка')
-    plt.legend()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    string = base64.b64encode(buf.read())
-    uri = urllib.parse.quote(string)
-    return mark_safe(f'<img src="data:image/png;base64,{uri}" />')
+def chart_etag(request, key):
+    # Ключ і є хешем вмісту, але ETag віддаємо лише для відомих діаграм
+    return key if chart_exists(key) else None
+
+
+@condition(etag_func=chart_etag)
+def chart(request, key):
+    if not chart_exists(key):
+        raise Http404
+    try:
+        path = get_chart_path(key, timeout=settings.CHART_RENDER_TIMEOUT)
+    except Exception:
+        # Не дочекались рендеру (TimeoutError) або він упав: клієнт повторить запит пізніше
+        response = HttpResponse(status=503)
+        response['Retry-After'] = settings.CHART_RETRY_AFTER
+        patch_cache_control(response, no_store=True)
+        return response
+    if path is None:
+        raise Http404
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
+
+
+def serve_media(request, name):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405)
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    if not can_access_media(request.user, name):
+        # Не розкриваємо, чи існує чужий файл
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        raise Http404
+
+    etag = file_etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+            response = accel_redirect_response(settings.MEDIA_ACCEL_REDIRECT_PREFIX, name, etag, stat)
+        else:
+            response = file_response(request, path, stat, etag)
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if name.startswith(f'{settings.THUMBNAIL_DIR}/'):
+            # Ім'я варіанта змінюється разом з фото, тож файл під цим ім'ям ніколи не змінюється
+            patch_cache_control(response, public=True, max_age=settings.THUMBNAIL_CACHE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+async def analytics_data(request):
+    user = await arequest_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    data = await acourse_statistics()
+    return JsonResponse({'courses': [
+        {'id': row['course'].id, 'title': row['course'].title,
+         **{key: value for key, value in row.items() if key != 'course'}}
+        for row in data
+    ]})
 
 
 def analytics(request):
-    courses = Course.objects.all()
-    data = []
+    data = course_statistics()
     plots = []
 
-    for course in courses:
-        submissions = PracticalWorkSubmission.objects.filter(practical_work__course=course)
-        avg_grade = submissions.aggregate(Avg('grade'))['grade__avg']
-
-        groups = course.groups.all()
-        total_students = User.objects.filter(groups__in=groups).distinct().count()
-        students_passed_all = User.objects.filter(
-            groups__in=groups,
-            practicalworksubmission__practical_work__course=course,
-            practicalworksubmission__grade__isnull=False
-        ).distinct().count()
-
-        practicals = PracticalWork.objects.filter(course=course)
-        practical_data = []
-        practical_plot_data = {}
-        for practical in practicals:
-            avg_practical_grade = practical.practicalworksubmission_set.aggregate(Avg('grade'))['grade__avg']
-            students_submitted = practical.practicalworksubmission_set.filter(grade__isnull=False).count()
-            practical_data.append({
-                'title': practical.title,
-                'avg_grade': avg_practical_grade,
-                'students_submitted': students_submitted
-            })
-            practical_plot_data[practical.title] = {'value': avg_practical_grade, 'label': practical.title}
-
-        practical_plot = generate_plot(practical_plot_data, f'Практичні роботи курсу {course.title}')
+    for course_data in data:
+        course = course_data['course']
+        practical_plot_data = {
+            practical['title']: {'value': practical['avg_grade'], 'label': practical['title']}
+            for practical in course_data['practicals']
+        }
+        practical_plot = chart_url(practical_plot_data, f'Практичні роботи курсу {course.title}')
         plots.append(practical_plot)
 
-        group_data = []
-        group_plot_data = {}
-        for group in groups:
-            avg_group_grade = submissions.filter(student__groups=group).aggregate(Avg('grade'))['grade__avg']
-            group_data.append({
-                'name': group.name,
-                'avg_grade': avg_group_grade
-            })
-            group_plot_data[group.name] = {'value': avg_group_grade, 'label': group.name}
-
-        group_plot = generate_plot(group_plot_data, f'Успішність по групам курсу {course.title}')
+        group_plot_data = {
+            group['name']: {'value': group['avg_grade'], 'label': group['name']}
+            for group in course_data['groups']
+        }
+        group_plot = chart_url(group_plot_data, f'Успішність по групам курсу {course.title}')
         plots.append(group_plot)
 
-        data.append({
-            'course': course,
-            'avg_grade': avg_grade,
-            'total_students': total_students,
-            'students_passed_all': students_passed_all,
-            'practicals': practical_data,
-            'groups': group_data
-        })
-
     return render(request, 'analytics.html', {'data': data, 'plots': plots})
-
-
-
@@ -0,0 +1,10 @@
+import django
+
+
+def init_worker():
+    """
+    Ініціалізатор процесів пулу run_workers. Процеси стартують через spawn і не успадковують
+    з'єднань з базою, тож Django налаштовується заново. Модуль не імпортує моделей: його
+    розпаковують у дочірньому процесі ще до django.setup().
+    """
+    django.setup()